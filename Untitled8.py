@@ -2,289 +2,324 @@
 # coding: utf-8
 
 import streamlit as st
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
-from selenium.common.exceptions import StaleElementReferenceException
+import html
 import time
-from bs4 import BeautifulSoup
 import pandas as pd
-import urllib.parse
-import base64
 import requests
-from io import BytesIO
-import re
+import os
+import logging
+from pipeline_metrics import metrics, start_metrics_server
+from scraper import (
+    DownloadBudgetError,
+    DownloadTimeoutError,
+    DownloadTooLargeError,
+    CourseCheckpoint,
+    JobCancelledError,
+    LoginPageError,
+    ScrapeJob,
+    build_assignments_zip,
+    get_assignment_cache,
+    get_download_cache,
+    get_driver_pool,
+    get_job_scheduler,
+    get_session_vault,
+    http_session_from_cookies,
+    logger,
+    login_and_extract_http,
+    scrape_with_browser,
+    session_cookies,
+    open_download,
+    DeadlineIndex,
+)
+
+# Span and counter events from pipeline_metrics go out as one JSON object per line
+logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 # Initialize session state variables
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'assignments' not in st.session_state:
     st.session_state.assignments = []
-if 'driver' not in st.session_state:
-    st.session_state.driver = None
-
-def create_webdriver():
-    # Configure Chrome options
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_options.add_argument("--disable-infobars")
-    
-    # Setup the webdriver
-    driver = webdriver.Chrome(options=chrome_options)
-    return driver
+if 'http_session' not in st.session_state:
+    st.session_state.http_session = None
+if 'render_model' not in st.session_state:
+    st.session_state.render_model = None
+if 'downloads' not in st.session_state:
+    st.session_state.downloads = {}
+if 'scrape_job' not in st.session_state:
+    st.session_state.scrape_job = None
 
-# CMS Login URL
-cms_url = "https://cms.bahria.edu.pk/Logins/Student/Login.aspx"
-lms_url = "https://lms.bahria.edu.pk/Student/Assignments.php"
-
-# Step 1: Login to CMS
-def login_to_cms(wait, driver, username, password):
-    driver.get(cms_url)
-    time.sleep(2)
+def scrape_account(username, password, assignment_cache, user_key, vault, progress):
+    """
+    Log in (or reuse a still-valid session from the vault) and extract every
+    course; runs on a ScrapeJob thread, so no Streamlit calls here. Returns the
+    state to store for the session, or None when the credentials were rejected.
+    """
+    # Try the browserless HTTP login first
+    try:
+        checkpoint = CourseCheckpoint()
+        session, assignments = login_and_extract_http(username, password, assignment_cache, user_key, progress,
+                                                      checkpoint, vault)
+        if session is None:
+            return None
+        return {"assignments": assignments, "http_session": session,
+                "skipped": dict(checkpoint.skipped)}
+    except (LoginPageError, requests.RequestException) as e:
+        # Fall back to Selenium if the portal could not be driven over HTTP
+        logger.warning("HTTP login unavailable, falling back to Selenium: %s", e)
+        metrics.inc("selenium_fallbacks_total")
     
-    # Wait for the enrollment field to be visible before interacting with it
-    enrollment_field = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_tbEnrollment")))
-    enrollment_field.send_keys(username)
-
-    # Wait for the password field to be visible
-    password_field = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_tbPassword")))
-    password_field.send_keys(password)
-
-    # For Campus selection
-    institute_dropdown = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_ddlInstituteID")))
-    select_institute = Select(institute_dropdown)
-    select_institute.select_by_visible_text("Karachi Campus")
-
-    # For Role selection (if not default)
-    role_dropdown = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_ddlSubUserType")))
-    select_role = Select(role_dropdown)
-    select_role.select_by_visible_text("Student")
+    # Login, navigate to LMS and extract assignments; a crashed browser is replaced and the scrape resumed
+    driver, checkpoint = scrape_with_browser(username, password, assignment_cache, user_key, progress,
+                                             vault=vault)
+    if driver is None:
+        return None
+    # Downloads go through requests, so the browser's cookies are enough and the browser goes back to the
+    # pool before the scheduler slot is freed; a logged-in user never holds a Chromium instance
+    try:
+        session = http_session_from_cookies(session_cookies(driver))
+    finally:
+        get_driver_pool().checkin(driver)
+    return {"assignments": checkpoint.assignments(), "http_session": session,
+            "skipped": dict(checkpoint.skipped)}
 
-    driver.find_element(By.ID, "BodyPH_btnLogin").click()
-    time.sleep(2)  # Wait for the login to complete
-    return True
+def release_scrape_result(result):
+    """Close the session of a scrape nobody is waiting for any more"""
+    if result is not None:
+        result["http_session"].close()
 
-# Step 2: Navigate to LMS and open Assignments
-def navigate_to_lms(driver):
-    driver.get("https://cms.bahria.edu.pk/Sys/Common/GoToLMS.aspx")
-    time.sleep(2)  # Wait for LMS to load
+def finish_scrape(job):
+    """Move a finished job's results into the session and rerun the whole page"""
+    st.session_state.scrape_job = None
+    st.session_state.scrape_preview = None
+    if isinstance(job.exception, JobCancelledError):
+        st.session_state.login_error = f"Extraction stopped: {job.exception}"
+    elif job.exception is not None:
+        st.session_state.login_error = f"An error occurred: {job.exception}"
+    elif job.result is None:
+        st.session_state.login_error = "Login failed. Please check your credentials."
+    else:
+        store_assignments(job.result["assignments"], job.result["skipped"])
+        st.session_state.http_session = job.result["http_session"]
+        st.session_state.logged_in = True
+    st.rerun()
 
-# Improved file download function
-def download_file_content(driver, url):
+@st.fragment(run_every=0.5)
+def scrape_progress_fragment():
     """
-    Download file content using requests with the cookies from Selenium session
+    Polls the running ScrapeJob and renders courses as they arrive. The render
+    model is only rebuilt when new courses have come in.
     """
-    try:
-        # Get cookies from the Selenium driver
-        selenium_cookies = driver.get_cookies()
-        
-        # Create a requests session and add the cookies
-        session = requests.Session()
-        for cookie in selenium_cookies:
-            session.cookies.set(cookie['name'], cookie['value'])
-        
-        # Make a request to the file URL
-        response = session.get(url, allow_redirects=True, timeout=10)
-        
-        # Check if the response was successful
-        if response.status_code == 200:
-            # Try to determine if it's a binary file or HTML
-            content_type = response.headers.get('Content-Type', '')
-            
-            if 'text/html' in content_type:
-                # It's an HTML page, let's look for download links
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Check for frame or iframe that might contain the actual document
-                frames = soup.find_all(['frame', 'iframe'], src=True)
-                if frames:
-                    for frame in frames:
-                        frame_url = urllib.parse.urljoin(url, frame['src'])
-                        frame_response = session.get(frame_url, allow_redirects=True, timeout=10)
-                        if frame_response.status_code == 200:
-                            return frame_response.content, get_filename_from_headers(frame_response)
-                
-                # Look for download links
-                for link in soup.find_all('a', href=True):
-                    href = link.get('href', '')
-                    if (
-                        re.search(r'\.(pdf|doc|docx|ppt|pptx|xls|xlsx|zip|rar|txt)$', href.lower()) or
-                        'download' in href.lower() or
-                        'attachment' in href.lower()
-                    ):
-                        file_url = urllib.parse.urljoin(url, href)
-                        file_response = session.get(file_url, allow_redirects=True, timeout=10)
-                        if file_response.status_code == 200:
-                            return file_response.content, get_filename_from_headers(file_response)
-                
-                # If no download links found, return the HTML content
-                return response.content, "assignment.html"
-            else:
-                # It's likely a binary file
-                return response.content, get_filename_from_headers(response)
-        else:
-            st.error(f"Failed to download file: HTTP {response.status_code}")
-            return None, None
-            
-    except Exception as e:
-        st.error(f"Error downloading file: {e}")
-        return None, None
-
-def get_filename_from_headers(response):
-    """Extract filename from Content-Disposition header or URL"""
-    # Try to get filename from Content-Disposition header
-    content_disposition = response.headers.get('Content-Disposition')
-    if content_disposition:
-        matches = re.findall(r'filename="(.+?)"', content_disposition)
-        if matches:
-            return matches[0]
-        
-        matches = re.findall(r'filename=([^;]+)', content_disposition)
-        if matches:
-            return matches[0].strip()
+    job = st.session_state.scrape_job
+    job.touch()
+    snapshot = job.snapshot()
+    if snapshot["done"]:
+        finish_scrape(job)
     
-    # Try to get filename from URL
-    url_path = urllib.parse.urlparse(response.url).path
-    filename = url_path.split('/')[-1]
+    if st.button("Cancel", key="cancel_scrape_button"):
+        # The job stops at its next progress update; the next poll picks that up
+        get_job_scheduler().cancel(job)
     
-    # Remove query parameters
-    if '?' in filename:
-        filename = filename.split('?')[0]
+    if snapshot["position"]:
+        # Still waiting for a free slot in the scheduler
+        st.info(f"⏳ The server is busy. You are number {snapshot['position']} in the queue, "
+                f"estimated wait about {max(1, round(snapshot['eta_s']))} seconds.")
+    else:
+        st.write(snapshot["status"] or "Logging in and extracting assignments...")
+        st.progress(snapshot["percent"])
+    for text in snapshot["errors"]:
+        st.error(text)
     
-    # If no extension or looks like a PHP file, try to determine from content type
-    if '.' not in filename or filename.endswith('.php'):
-        content_type = response.headers.get('Content-Type', '')
-        if 'pdf' in content_type:
-            filename = f"assignment_{int(time.time())}.pdf"
-        elif 'word' in content_type or 'doc' in content_type:
-            filename = f"assignment_{int(time.time())}.docx"
-        elif 'powerpoint' in content_type or 'presentation' in content_type:
-            filename = f"assignment_{int(time.time())}.pptx"
-        elif 'excel' in content_type or 'spreadsheet' in content_type:
-            filename = f"assignment_{int(time.time())}.xlsx"
-        elif 'zip' in content_type:
-            filename = f"assignment_{int(time.time())}.zip"
-        elif 'text/html' in content_type:
-            filename = f"assignment_{int(time.time())}.html"
-        else:
-            filename = f"assignment_{int(time.time())}.pdf"  # Default to PDF
+    courses = snapshot["courses"]
+    if not courses:
+        preview = st.session_state.get("scrape_preview")
+        if preview:
+            cached_assignments, cached_at = preview
+            st.info(f"Showing {len(cached_assignments)} cached assignments from "
+                    f"{time.strftime('%H:%M', time.localtime(cached_at))} while refreshing...")
+            st.dataframe(pd.DataFrame(cached_assignments)[["Course", "Assignment", "Deadline"]],
+                         hide_index=True)
+        return
     
-    return filename
-
-# Step 3: Extract assignments for a given course
-def extract_assignments(driver):
-    assignments_data = []
-
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    assignments_table = soup.find("table")
+    rendered_count, model = st.session_state.get("scrape_render") or (0, None)
+    if rendered_count != len(courses):
+        model = build_render_model([a for _, course_assignments in courses for a in course_assignments])
+        st.session_state.scrape_render = (len(courses), model)
     
-    if not assignments_table:
-        print("No assignments found for this course.")
-        return []
-
-    rows = assignments_table.find_all("tr")[1:]
-
-    for row in rows:
-        cells = row.find_all("td")
-        if len(cells) > 6:  # Ensure there are enough columns
-            assignment_name = cells[1].text.strip()
-            deadline = cells[7].text.strip()
-            if cells[6].text.strip() == "Deadline Exceeded":
-                continue
-            
-            # Extract the download link from cell[2]
-            download_link_tag = cells[2].find('a', href=True)
-            if download_link_tag:
-                # Get the absolute URL for download
-                download_link = download_link_tag.get('href', '')
-                if download_link:
-                    # Make sure the link is absolute
-                    if not download_link.startswith('http'):
-                        # Create absolute URL
-                        base_url = "https://lms.bahria.edu.pk/Student/"
-                        download_link = urllib.parse.urljoin(base_url, download_link)
-                else:
-                    download_link = None
-            else:
-                download_link = None
+    st.caption("Downloads become available once every course has loaded.")
+    for course, positions in model["courses"]:
+        with st.expander(f"📚 {course}", expanded=True):
+            render_cards(model, positions, downloads=False)
 
-            assignments_data.append({
-                "Assignment": assignment_name,
-                "Deadline": deadline,
-                "Download Link": download_link
-            })
-    
-    return assignments_data
+def build_render_model(assignments):
+    """
+    Everything the assignments view needs, computed once per scrape: the
+    deadline index, one pre-rendered card per assignment, and the courses in
+    the order they were scraped, each with its assignments sorted by deadline
+    (unparseable deadlines last).
+    """
+    index = DeadlineIndex(assignments)
+    cards = []
+    for i, assignment in enumerate(assignments):
+        assignment_name = assignment['Assignment']
+        cards.append({
+            # Create a unique key for each button
+            "key": f"download_button_{i}_{assignment_name.replace(' ', '_')}",
+            "assignment": assignment_name,
+            "course": assignment['Course'],
+            "url": assignment['Download Link'] or None,
+            "html": f"""
+                    <div class="assignment-card">
+                        <div style='margin-bottom: 0.5rem;'>
+                            <strong>Assignment:</strong> {html.escape(assignment_name)}
+                        </div>
+                        <div style='margin-bottom: 0.5rem;'>
+                            <strong>Deadline:</strong> <span class="deadline-text">{html.escape(assignment['Deadline'])}</span>
+                        </div>
+                    </div>
+                    """,
+        })
 
-# Step 4: Extract assignments for all courses
-def extract_all_courses(wait, driver):
-    driver.get(lms_url)
-    time.sleep(2)
+    courses = {assignment['Course']: [] for assignment in assignments}
+    for position in index.by_deadline():
+        courses[assignments[position]['Course']].append(position)
+    return {"index": index, "cards": cards, "courses": list(courses.items())}
 
-    all_assignments = []
-    progress_text = st.empty()
+def render_cards(model, positions, show_course=False, downloads=True):
+    for position in positions:
+        card = model["cards"][position]
+        if show_course:
+            st.caption(f"📚 {card['course']}")
+        st.markdown(card["html"], unsafe_allow_html=True)
+        
+        if not downloads:
+            continue
+        if card["url"]:
+            download_fragment(card)
+        else:
+            st.info("No download available for this assignment.")
 
-    # Refresh the dropdown options each time to avoid stale references
-    while True:
-        try:
-            course_dropdown = wait.until(EC.presence_of_element_located((By.NAME, "courseName")))
-            select = Select(course_dropdown)
-            options = [option.text.strip() for option in select.options if option.text.strip() and option.text.strip() != "Select Course"]
-            break  # Break the loop if the dropdown is successfully located
-        except StaleElementReferenceException:
-            continue  # Retry if the element went stale
+def read_on_click(file_obj):
+    """
+    data callable for st.download_button: the file is only read when Save is
+    clicked, so reruns do not copy every finished download into media storage
+    """
+    def read():
+        file_obj.seek(0)
+        return file_obj.read()
+    return read
 
-    # Create progress bar
-    progress_bar = st.progress(0)
-    total_courses = len(options)
-    
-    # Iterate through all courses
-    for i, course_name in enumerate(options):
-        progress_text.write(f"Fetching assignments for: {course_name}")
-        progress_value = int((i / total_courses) * 100)
-        progress_bar.progress(progress_value)
+def clear_downloads():
+    for file_obj, _ in st.session_state.downloads.values():
+        file_obj.close()
+    st.session_state.downloads = {}
 
-        # Refresh dropdown each time to prevent stale element issues
-        course_dropdown = wait.until(EC.presence_of_element_located((By.NAME, "courseName")))
-        select = Select(course_dropdown)
-        
-        try:
-            select.select_by_visible_text(course_name)
-            time.sleep(0.5)  # Give it some time to load the assignments page
+def store_assignments(assignments, skipped=None):
+    """Keep a fresh scrape in the session together with its render model and any skipped courses"""
+    st.session_state.assignments = assignments
+    st.session_state.skipped_courses = skipped or {}
+    st.session_state.render_model = build_render_model(assignments)
+    clear_downloads()
 
-            # Extract assignments
-            assignments = extract_assignments(driver)
-            for assignment in assignments:
-                assignment["Course"] = course_name
-                all_assignments.append(assignment)
+def get_client():
+    return st.session_state.http_session
 
-        except StaleElementReferenceException:
-            progress_text.write(f"Stale element encountered. Retrying for course: {course_name}")
-            continue  # Retry with the next course if the dropdown goes stale
-    
-    progress_bar.progress(100)
-    progress_text.write("All assignments extracted successfully!")
-    time.sleep(1)
-    progress_text.empty()
+@st.fragment
+def download_fragment(card):
+    """
+    One assignment's download button. Clicking it only reruns this fragment,
+    and the downloaded file is kept in the session so it survives full reruns.
+    """
+    button_key = card["key"]
+    if st.button(f"📥 Download {card['assignment']}", key=button_key):
+        client = get_client()
+        if client is None:
+            st.error("Session expired. Please log in again.")
+            st.session_state.logged_in = False
+            store_assignments([])
+            st.rerun()
+            
+        with st.spinner(f"Downloading {card['assignment']}..."):
+            download_progress = st.empty()
+            shown = -1
+            
+            def report_download_progress(received, total):
+                nonlocal shown
+                # Only redraw when the shown percentage or megabyte changes
+                step = int(received * 100 / total) if total else received // (1024 * 1024)
+                if step != shown:
+                    shown = step
+                    if total:
+                        download_progress.progress(min(step, 100), text=f"{received / (1024 * 1024):.1f} of {total / (1024 * 1024):.1f} MB")
+                    else:
+                        download_progress.caption(f"{received / (1024 * 1024):.1f} MB received")
+            
+            try:
+                # Stream the file to disk, then hand it to Streamlit's download endpoint
+                file_obj, filename = open_download(client, card["url"], on_progress=report_download_progress)
+                download_progress.empty()
+                previous = st.session_state.downloads.pop(button_key, None)
+                if previous:
+                    previous[0].close()
+                st.session_state.downloads[button_key] = (file_obj, filename)
+            except (DownloadTooLargeError, DownloadBudgetError, DownloadTimeoutError) as e:
+                st.error(f"Unable to download the assignment file: {e}")
+            except Exception as e:
+                st.error(f"Error downloading assignment: {e}")
     
-    return all_assignments
+    downloaded = st.session_state.downloads.get(button_key)
+    if downloaded:
+        file_obj, filename = downloaded
+        st.markdown(f"""
+        <div class="success-box">
+            <p>✅ Download ready: {html.escape(filename)}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.download_button(
+            f"💾 Save {filename}",
+            data=read_on_click(file_obj),
+            file_name=filename,
+            mime=get_mime_type(filename),
+            key=f"save_{button_key}",
+            on_click="ignore",
+        )
 
-def get_download_link_html(file_content, filename, button_text="Download Assignment"):
-    """Generate HTML for a download button with file content"""
-    if file_content is None:
-        return ""
+@st.fragment
+def download_all_fragment():
+    """Bulk export of every outstanding assignment file, rerun on its own"""
+    if st.button("📦 Download all as ZIP", key="download_all_button"):
+        client = get_client()
+        if client is None:
+            st.error("Session expired. Please log in again.")
+        else:
+            zip_progress = st.progress(0)
+            zip_text = st.empty()
+            
+            def report_zip_progress(done, total, assignment, error):
+                zip_progress.progress(int((done / total) * 100))
+                status = f"failed ({error})" if error else "added"
+                zip_text.write(f"{done}/{total}: {assignment['Assignment']} ({assignment['Course']}) {status}")
+            
+            archive, failures = build_assignments_zip(client, st.session_state.assignments, report_zip_progress)
+            zip_text.empty()
+            # Kept with the single-file downloads so the archive is closed on logout or a new scrape
+            previous = st.session_state.downloads.pop("download_all", None)
+            if previous:
+                previous[0].close()
+            st.session_state.downloads["download_all"] = (archive, "assignments.zip")
+            for assignment, error in failures:
+                st.warning(f"Could not download {assignment['Assignment']} ({assignment['Course']}): {error}")
     
-    b64 = base64.b64encode(file_content).decode()
-    mime_type = get_mime_type(filename)
-    download_link = f'<a href="data:{mime_type};base64,{b64}" download="{filename}" class="download-button">{button_text}</a>'
-    return download_link
+    downloaded = st.session_state.downloads.get("download_all")
+    if downloaded:
+        st.download_button(
+            "💾 Save assignments.zip",
+            data=read_on_click(downloaded[0]),
+            file_name="assignments.zip",
+            mime="application/zip",
+            key="save_all_button",
+            on_click="ignore",
+        )
 
 def get_mime_type(filename):
     """Get MIME type based on file extension"""
@@ -304,6 +339,34 @@ def get_mime_type(filename):
     }
     return mime_types.get(extension, 'application/octet-stream')
 
+@st.cache_resource
+def start_metrics_endpoint():
+    """Serve Prometheus metrics on BUKC_METRICS_PORT once per process, if configured"""
+    port = os.environ.get("BUKC_METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+def show_admin_panel():
+    """p50/p95 per pipeline stage, the download cache and the raw counters"""
+    stages, counters = metrics.snapshot()
+    with st.expander("📊 Pipeline timings (admin)", expanded=False):
+        if stages:
+            st.dataframe(pd.DataFrame([
+                {
+                    "Stage": stage,
+                    "Count": stats["count"],
+                    "p50 (ms)": round(stats["p50_s"] * 1000, 1),
+                    "p95 (ms)": round(stats["p95_s"] * 1000, 1),
+                }
+                for stage, stats in sorted(stages.items())
+            ]), hide_index=True)
+        else:
+            st.info("No timings recorded yet.")
+        cache = get_download_cache().stats()
+        st.caption(f"Download cache: {cache['entries']} files, {cache['bytes'] / (1024 * 1024):.1f} MB, "
+                   f"{cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions")
+        if counters:
+            st.json(counters)
+
 # Main program
 def run():
     # Set page config and custom theme
@@ -375,23 +438,17 @@ def run():
         }
         
         /* Download button styling */
-        .download-button {
-            display: inline-block;
-            padding: 0.5rem 1rem;
-            background-color: #2ecc71;
+        .stDownloadButton > button {
+            background-color: #2ecc71 !important;
             color: white !important;
-            text-decoration: none;
-            border-radius: 5px;
-            margin-top: 0.5rem;
-            transition: all 0.3s ease;
-            font-weight: bold;
-            cursor: pointer;
+            border-radius: 5px !important;
+            border: none !important;
+            font-weight: bold !important;
         }
         
-        .download-button:hover {
-            background-color: #27ae60;
+        .stDownloadButton > button:hover {
+            background-color: #27ae60 !important;
             color: white !important;
-            text-decoration: none;
         }
         
         /* Deadline styling */
@@ -441,15 +498,37 @@ def run():
     
     st.title('Bahria University Assignment Extractor')
     
-    # Add security note with improved styling
-    st.markdown("""
+    # Add security note with improved styling; it spells out what is kept and for how long
+    vault = get_session_vault()
+    if vault:
+        # Expired sessions are otherwise only dropped when the next login stores one
+        vault.purge()
+    session_note = (f" Your logged-in portal session is kept encrypted in server memory for up to "
+                    f"{max(1, round(vault.ttl / 60))} minutes after login so a return visit skips the login form; "
+                    "Logout ends it." if vault else "")
+    st.markdown(f"""
     <div class="security-box">
-        <p>🔒 <strong>Security Note:</strong> This app does not store your password or any login credentials. All data is processed in real-time and is not saved anywhere.</p>
+        <p>🔒 <strong>Security Note:</strong> Your password is never stored. Your extracted assignments are
+        cached in server memory for up to {max(1, round(get_assignment_cache().ttl / 60))} minutes.{session_note}
+        Downloaded assignment files are cached on the server's disk and only served again after the portal
+        confirms your access.</p>
     </div>
     """, unsafe_allow_html=True)
     
+    # The shared browser pool is created by the first Selenium fallback, so HTTP-only
+    # deployments (or hosts without Chrome) never launch or retry a browser
+    start_metrics_endpoint()
+    
+    # Scrape in progress
+    if st.session_state.scrape_job is not None:
+        scrape_progress_fragment()
+    
     # Login section
-    if not st.session_state.logged_in:
+    elif not st.session_state.logged_in:
+        login_error = st.session_state.pop("login_error", None)
+        if login_error:
+            st.error(login_error)
+        
         with st.form("login_form"):
             st.subheader("Login to CMS")
             st.markdown("""
@@ -468,34 +547,24 @@ def run():
             
             if submit_button:
                 if username and password:
-                    with st.spinner("Logging in and extracting assignments..."):
-                        try:
-                            driver = create_webdriver()
-                            wait = WebDriverWait(driver, 10)
-                            
-                            # Login to CMS
-                            login_status = login_to_cms(wait, driver, username, password)
-                            
-                            if login_status:
-                                # Navigate to LMS and extract assignments
-                                navigate_to_lms(driver)
-                                assignments = extract_all_courses(wait, driver)
-                                
-                                # Store assignments in session state
-                                st.session_state.assignments = assignments
-                                st.session_state.logged_in = True
-                                st.session_state.driver = driver
-                                
-                                # Force page rerun to show assignments
-                                st.rerun()
-                            else:
-                                st.error("Login failed. Please check your credentials.")
-                                if 'driver' in locals():
-                                    driver.quit()
-                        except Exception as e:
-                            st.error(f"An error occurred: {e}")
-                            if 'driver' in locals():
-                                driver.quit()
+                    assignment_cache = get_assignment_cache()
+                    user_key = assignment_cache.user_key(username, password)
+                    # Cached results from a previous visit are shown while the refresh runs
+                    cached_assignments, cached_at = assignment_cache.get_user(user_key)
+                    st.session_state.scrape_preview = (cached_assignments, cached_at) if cached_assignments else None
+                    st.session_state.scrape_render = None
+                    
+                    # Logged-in cookies are kept briefly so a returning visit skips the login form
+                    vault = get_session_vault()
+                    st.session_state.vault_id = vault.entry_id(username, password) if vault else None
+                    
+                    # Queue the scrape; scrape_progress_fragment renders courses as they arrive
+                    st.session_state.scrape_job = get_job_scheduler().submit(ScrapeJob(
+                        lambda progress: scrape_account(username, password, assignment_cache, user_key, vault,
+                                                        progress),
+                        cleanup=release_scrape_result,
+                    ))
+                    st.rerun()
                 else:
                     st.warning("Please enter your enrollment number and password.")
     
@@ -505,76 +574,57 @@ def run():
         col1, col2 = st.columns([1, 6])
         with col1:
             if st.button("Logout", key="logout_button"):
-                if st.session_state.driver:
-                    st.session_state.driver.quit()
-                st.session_state.driver = None
+                if st.session_state.http_session:
+                    st.session_state.http_session.close()
+                # Logging out ends the reusable portal session too
+                vault = get_session_vault()
+                if vault and st.session_state.get("vault_id"):
+                    vault.invalidate(st.session_state.vault_id)
+                st.session_state.vault_id = None
+                st.session_state.http_session = None
                 st.session_state.logged_in = False
-                st.session_state.assignments = []
+                store_assignments([])
                 st.rerun()
         
+        # Courses given up on during the scrape are listed rather than silently missing
+        skipped = st.session_state.get("skipped_courses")
+        if skipped:
+            st.warning("Some courses could not be loaded: " + "; ".join(
+                f"{course} ({reason})" for course, reason in skipped.items()))
+        
         if st.session_state.assignments:
-            # Convert to DataFrame for easier handling
-            df = pd.DataFrame(st.session_state.assignments)
-            
             # Display assignments grouped by course with improved styling
             st.subheader("Your Assignments")
             
-            # Group by course and display
-            courses = df['Course'].unique()
+            # Bulk export of every outstanding assignment file
+            download_all_fragment()
             
-            for course in courses:
-                with st.expander(f"📚 {course}", expanded=True):
-                    course_assignments = df[df['Course'] == course]
-                    
-                    for i, row in course_assignments.iterrows():
-                        download_url = row['Download Link'] if pd.notna(row['Download Link']) else None
-                        assignment_name = row['Assignment']
-                        
-                        # Create a unique key for each button
-                        button_key = f"download_button_{i}_{assignment_name.replace(' ', '_')}"
-                        
-                        st.markdown(f"""
-                        <div class="assignment-card">
-                            <div style='margin-bottom: 0.5rem;'>
-                                <strong>Assignment:</strong> {assignment_name}
-                            </div>
-                            <div style='margin-bottom: 0.5rem;'>
-                                <strong>Deadline:</strong> <span class="deadline-text">{row['Deadline']}</span>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        if download_url:
-                            if st.button(f"📥 Download {assignment_name}", key=button_key):
-                                if st.session_state.driver is None:
-                                    st.error("Session expired. Please log in again.")
-                                    st.session_state.logged_in = False
-                                    st.session_state.assignments = []
-                                    st.rerun()
-                                    
-                                with st.spinner(f"Downloading {assignment_name}..."):
-                                    try:
-                                        # Download the file content using the improved function
-                                        file_content, filename = download_file_content(st.session_state.driver, download_url)
-                                        
-                                        if file_content and filename:
-                                            # Generate download link for user
-                                            download_html = get_download_link_html(file_content, filename)
-                                            
-                                            st.markdown(f"""
-                                            <div class="success-box">
-                                                <p>✅ Download ready: {filename}</p>
-                                                {download_html}
-                                            </div>
-                                            """, unsafe_allow_html=True)
-                                        else:
-                                            st.error("Unable to download the assignment file.")
-                                    except Exception as e:
-                                        st.error(f"Error downloading assignment: {e}")
-                        else:
-                            st.info("No download available for this assignment.")
+            model = st.session_state.render_model
+            view = st.radio("View", ["By course", "By urgency", "Due in 7 days", "Overdue"],
+                            horizontal=True, key="assignments_view")
+            
+            # Render from the precomputed model; each download button reruns on its own
+            if view == "By course":
+                for course, positions in model["courses"]:
+                    with st.expander(f"📚 {course}", expanded=True):
+                        render_cards(model, positions)
+            else:
+                index = model["index"]
+                positions = {
+                    "By urgency": index.by_urgency,
+                    "Due in 7 days": lambda: index.due_within(7),
+                    "Overdue": index.overdue,
+                }[view]()
+                if positions:
+                    render_cards(model, positions, show_course=True)
+                else:
+                    st.info("No assignments match this view.")
         else:
             st.info("No assignments found.")
+    
+    # Optional admin panel with per-stage latency percentiles
+    if os.environ.get("BUKC_ADMIN_PANEL") == "1":
+        show_admin_panel()
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
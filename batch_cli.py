@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Headless batch extraction for many accounts, without Streamlit.
+
+    python batch_cli.py credentials.csv --output assignments.jsonl
+    python batch_cli.py credentials.jsonl --format parquet --output assignments.parquet --concurrency 8
+
+The credentials file is either a CSV with "username" and "password" columns
+or JSON Lines with the same keys. Accounts are processed concurrently (up to
+--concurrency at a time) with the browserless HTTP engine, falling back to
+the shared Chromium pool when --engine auto and the portal cannot be driven
+over HTTP. The pool holds --concurrency browsers unless BUKC_DRIVER_POOL_SIZE
+is set. Each assignment becomes one row tagged with its username.
+"""
+
+import argparse
+import contextlib
+import csv
+import importlib.util
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+import scraper
+
+FIELDS = ["Username", "Course", "Assignment", "Deadline", "Download Link"]
+
+
+class LoginFailedError(Exception):
+    """The portal rejected the account's credentials"""
+
+
+class ConsoleProgress(scraper.ProgressReporter):
+    """Prints one account's progress to stderr, prefixed with its username"""
+
+    lock = threading.Lock()
+
+    def __init__(self, username, quiet=False):
+        self.username = username
+        self.quiet = quiet
+        self.last_percent = -1
+
+    def _print(self, text):
+        with self.lock:
+            print(f"[{self.username}] {text}", file=sys.stderr, flush=True)
+
+    def status(self, text):
+        if not self.quiet:
+            self._print(text)
+
+    def progress(self, percent):
+        # Only print every 25% so large batches stay readable
+        if not self.quiet and percent // 25 != self.last_percent // 25:
+            self.last_percent = percent
+            self._print(f"{percent}%")
+
+    def error(self, text):
+        self._print(f"error: {text}")
+
+
+def load_credentials(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    credentials = []
+    for i, row in enumerate(rows, start=1):
+        username = (row.get("username") or "").strip()
+        password = row.get("password") or ""
+        if not username or not password:
+            sys.exit(f"{path}: entry {i} needs both username and password")
+        credentials.append((username, password))
+    return credentials
+
+
+def extract_account(username, password, engine, progress, browser_slots=None):
+    """Log in and scrape one account, returning its assignments; browser_slots bounds concurrent Selenium scrapes"""
+    if engine in ("http", "auto"):
+        try:
+            session, assignments = scraper.login_and_extract_http(username, password, progress=progress)
+            if session is None:
+                raise LoginFailedError("Login failed. Please check the credentials.")
+            session.close()
+            return assignments
+        except (scraper.LoginPageError, requests.RequestException) as e:
+            if engine == "http":
+                raise
+            progress.status(f"HTTP login unavailable, falling back to Selenium: {e}")
+
+    # A crashed browser is replaced and the scrape resumed; skipped courses are reported through progress
+    with browser_slots or contextlib.nullcontext():
+        driver, checkpoint = scraper.scrape_with_browser(username, password, progress=progress)
+        if driver is None:
+            raise LoginFailedError("Login failed. Please check the credentials.")
+        scraper.get_driver_pool().checkin(driver)
+    return checkpoint.assignments()
+
+
+class RowWriter:
+    """Writes JSON Lines and CSV rows as accounts finish; Parquet is written once at the end"""
+
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.path = path
+        self.rows = []
+        self.file = None
+        if fmt == "parquet":
+            if importlib.util.find_spec("pandas") is None or importlib.util.find_spec("pyarrow") is None:
+                sys.exit("Parquet output needs pandas and pyarrow installed")
+        else:
+            self.file = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+            if fmt == "csv":
+                self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+                self.csv.writeheader()
+
+    def write(self, rows):
+        if self.fmt == "jsonl":
+            for row in rows:
+                self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.file.flush()
+        elif self.fmt == "csv":
+            self.csv.writerows(rows)
+            self.file.flush()
+        else:
+            self.rows.extend(rows)
+
+    def close(self):
+        if self.fmt == "parquet":
+            import pandas as pd
+            pd.DataFrame(self.rows, columns=FIELDS).to_parquet(self.path, index=False)
+        elif self.file is not sys.stdout:
+            self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract assignments for many accounts without a browser tab each")
+    parser.add_argument("credentials", help="CSV or JSON Lines file with username and password")
+    parser.add_argument("--output", "-o", default="-", help="output path, - for stdout (default)")
+    parser.add_argument("--format", "-f", choices=["jsonl", "csv", "parquet"],
+                        help="output format (default: from the output extension, else jsonl)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4, help="accounts processed at once")
+    parser.add_argument("--engine", choices=["auto", "http", "selenium"], default="auto")
+    parser.add_argument("--quiet", "-q", action="store_true", help="only report errors and the summary")
+    args = parser.parse_args()
+
+    fmt = args.format or next((ext for ext in ("csv", "parquet") if args.output.endswith("." + ext)), "jsonl")
+    if fmt == "parquet" and args.output == "-":
+        sys.exit("Parquet output needs --output")
+
+    credentials = load_credentials(args.credentials)
+    # Set before the pool is first created; with a smaller explicit pool, accounts that need
+    # a browser wait for a slot here instead of timing out in WebDriverPool.checkout
+    pool_size = int(os.environ.setdefault("BUKC_DRIVER_POOL_SIZE", str(max(1, args.concurrency))))
+    browser_slots = threading.BoundedSemaphore(max(1, pool_size))
+    writer = RowWriter(args.output, fmt)
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+            futures = {
+                executor.submit(extract_account, username, password, args.engine,
+                                ConsoleProgress(username, args.quiet), browser_slots): username
+                for username, password in credentials
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                username = futures[future]
+                try:
+                    assignments = future.result()
+                except Exception as e:
+                    failed += 1
+                    ConsoleProgress(username).error(e)
+                    continue
+                writer.write([{"Username": username, **{k: a.get(k) for k in FIELDS[1:]}} for a in assignments])
+                if not args.quiet:
+                    print(f"{done}/{len(credentials)} accounts done ({username}: {len(assignments)} assignments)",
+                          file=sys.stderr, flush=True)
+    finally:
+        writer.close()
+        scraper.shutdown()
+
+    print(f"{len(credentials) - failed} of {len(credentials)} accounts extracted", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Page-load time and browser memory for the standard and lean Chromium profiles.
+
+    python benchmarks/bench_browser.py [--repeat 3] [--courses 5] [--output browser.json]
+
+Each profile launches a fresh browser per repeat, logs in to a local
+mock_cms server, and loads the login page, the LMS landing page and every
+course page. The LMS pages use the recorded layout, whose stylesheets,
+scripts and images the mock serves. Page load is the wall time of
+driver.get() plus the Navigation Timing milestones, and memory is the
+summed RSS of the Chromium processes under chromedriver (needs psutil).
+Later repeats of the lean profile run against its warm disk cache. Needs
+Chrome and chromedriver.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_cms import make_account, start_mock_server  # noqa: E402
+
+LAYOUT = os.path.join(ROOT, "benchmarks", "fixtures", "lms_layout.html")
+USERNAME = "bench-browser"
+PASSWORD = "bench"
+
+NAVIGATION_TIMING = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+return {
+    dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd : null,
+    load_ms: nav && nav.loadEventEnd ? nav.loadEventEnd : null,
+    resources: resources.length,
+    transfer_kb: resources.reduce((total, r) => total + r.transferSize, 0) / 1024,
+};
+"""
+
+
+def browser_rss_mb(driver):
+    if psutil is None:
+        return None
+    try:
+        service = psutil.Process(driver.service.process.pid)
+        processes = service.children(recursive=True)
+    except psutil.Error:
+        return None
+    total = 0
+    for process in processes:
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return round(total / (1024 * 1024), 1)
+
+
+def load(driver, url, samples):
+    start = time.perf_counter()
+    driver.get(url)
+    wall_ms = (time.perf_counter() - start) * 1000
+    timing = driver.execute_script(NAVIGATION_TIMING)
+    samples.append({"url": url, "get_ms": round(wall_ms, 2), **timing})
+
+
+def run_profile(app, lean, repeat):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        driver = app.create_webdriver(lean=lean)
+        launch_ms = (time.perf_counter() - start) * 1000
+        pages = []
+        try:
+            load(driver, app.cms_url, pages)
+            if not app.login_to_cms(WebDriverWait(driver, 10), driver, USERNAME, PASSWORD):
+                raise SystemExit("Login failed against the mock")
+            app.navigate_to_lms(driver)
+            load(driver, app.lms_url, pages)
+            for value, _ in app.parse_course_options(driver.page_source):
+                load(driver, app.course_url(value), pages)
+            rss = browser_rss_mb(driver)
+        finally:
+            app.quit_webdriver(driver)
+        runs.append({"launch_ms": round(launch_ms, 2), "rss_mb": rss, "pages": pages})
+    return runs
+
+
+def summarize(runs):
+    pages = [page for run in runs for page in run["pages"]]
+    rss = [run["rss_mb"] for run in runs if run["rss_mb"] is not None]
+    loads = [page["load_ms"] for page in pages if page["load_ms"] is not None]
+    return {
+        "launch_ms": round(statistics.median(run["launch_ms"] for run in runs), 2),
+        "get_ms": round(statistics.median(page["get_ms"] for page in pages), 2),
+        "dom_content_loaded_ms": round(statistics.median(page["dom_content_loaded_ms"] for page in pages), 2),
+        "load_ms": round(statistics.median(loads), 2) if loads else None,
+        "resources_per_page": round(statistics.mean(page["resources"] for page in pages), 1),
+        "transfer_kb_per_page": round(statistics.mean(page["transfer_kb"] for page in pages), 1),
+        "rss_mb": round(statistics.median(rss), 1) if rss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the standard and lean Chromium profiles")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--asset-kb", type=int, default=128, help="size of every stylesheet, script and image")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    with open(LAYOUT, encoding="utf-8") as f:
+        layout = f.read()
+    server, base_url = start_mock_server(accounts={USERNAME: make_account(PASSWORD, args.courses)},
+                                         lms_layout=layout, asset_size=args.asset_kb * 1024)
+
+    # The app reads its portal URLs and cache location at import time
+    os.environ["BUKC_CMS_BASE"] = base_url
+    os.environ["BUKC_LMS_BASE"] = base_url
+    os.environ.setdefault("BUKC_BROWSER_CACHE_DIR", tempfile.mkdtemp(prefix="bukc-browser-bench-"))
+    import scraper as app
+
+    if psutil is None:
+        print("psutil is not installed; skipping browser memory")
+
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": vars(args), "profiles": {}}
+    for name, lean in (("standard", False), ("lean", True)):
+        runs = run_profile(app, lean, args.repeat)
+        results["profiles"][name] = {"summary": summarize(runs), "runs": runs}
+
+    server.shutdown()
+
+    standard = results["profiles"]["standard"]["summary"]
+    lean = results["profiles"]["lean"]["summary"]
+    print(f"{'':<24}{'standard':>12}{'lean':>12}")
+    for key in standard:
+        before, after = standard[key], lean[key]
+        change = f"{(after - before) / before * 100:+.0f}%" if before and after is not None else ""
+        print(f"{key:<24}{str(before):>12}{str(after):>12}{change:>9}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Per-course parse time for the assignments table over saved LMS pages.
+
+    python benchmarks/bench_parse.py [--repeat 200]
+
+"before" is the original approach: the whole page through html.parser.
+"strainer" is the pure-Python fallback limited to the <table>, and "lxml"
+is the fast path used when lxml is installed. All three must agree.
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scraper as app  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "assignments_*_rows.html")
+
+
+def time_parser(parse, page_html, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(page_html)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    parsers = [
+        ("before", lambda page: app.parse_assignments_soup(page, only_table=False)),
+        ("strainer", app.parse_assignments_soup),
+    ]
+    if app.lxml_html is not None:
+        parsers.append(("lxml", app.parse_assignments_lxml))
+    else:
+        print("lxml is not installed; skipping the lxml parser")
+
+    header = f"{'fixture':<28}{'KB':>6}" + "".join(f"{name + ' ms':>13}" for name, _ in parsers) + f"{'speedup':>10}"
+    print(header)
+    print("-" * len(header))
+    for path in sorted(glob.glob(FIXTURES), key=os.path.getsize):
+        with open(path, encoding="utf-8") as f:
+            page_html = f.read()
+
+        expected = parsers[0][1](page_html)
+        for name, parse in parsers[1:]:
+            if parse(page_html) != expected:
+                sys.exit(f"{name} parser disagrees with the original on {os.path.basename(path)}")
+
+        timings = [time_parser(parse, page_html, args.repeat) for _, parse in parsers]
+        print(
+            f"{os.path.basename(path):<28}{len(page_html) // 1024:>6}"
+            + "".join(f"{ms:>13.3f}" for ms in timings)
+            + f"{timings[0] / timings[-1]:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Offline stage-level benchmark of the login/scrape/download pipeline.
+
+    python benchmarks/bench_pipeline.py --output results.json
+    python benchmarks/bench_pipeline.py --compare results.json   # fail on regressions
+
+A local mock_cms server serves the CMS login, the GoToLMS hand-off, one
+Assignments.php page per course (wrapped in a recorded LMS layout) and file
+downloads. Each stage is timed separately for synthetic accounts with 5, 20
+and 100 courses, and throughput plus Python heap / process memory are
+reported. By default the browserless HTTP engine is measured; --selenium
+times the Chromium functions instead (needs Chrome and chromedriver).
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_cms import make_account, start_mock_server  # noqa: E402
+
+LAYOUT = os.path.join(ROOT, "benchmarks", "fixtures", "lms_layout.html")
+PASSWORD = "bench"
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "total_ms": round(sum(ordered) * 1000, 3),
+    }
+
+
+def timed(samples, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def fetch_file(app, client, url, cache):
+    """Download and read one file as the app does, against the scenario's own download cache"""
+    file_obj, _ = app.open_download(client, url, cache)
+    with file_obj:
+        return len(file_obj.read())
+
+
+def run_http(app, username, repeat, max_downloads, cache):
+    stages = {name: [] for name in ("login_to_cms", "navigate_to_lms", "extract_all_courses",
+                                    "extract_assignments", "download_file_content")}
+    assignments = []
+    for _ in range(repeat):
+        session = app.create_http_session()
+        if not timed(stages["login_to_cms"], app.http_login_to_cms, session, username, PASSWORD):
+            raise SystemExit(f"Login failed for {username}")
+        timed(stages["navigate_to_lms"], app.http_navigate_to_lms, session)
+        assignments = timed(stages["extract_all_courses"], app.extract_all_courses_http, session)
+
+    # Parse cost per course page, fetched once up front
+    pages = [session.get(app.course_url(value), timeout=10).text
+             for value, _ in app.parse_course_options(session.get(app.lms_url, timeout=10).text)]
+    for page_html in pages:
+        timed(stages["extract_assignments"], app.parse_assignments, page_html)
+
+    links = [a["Download Link"] for a in assignments if a["Download Link"]][:max_downloads]
+    downloaded = 0
+    for url in links:
+        downloaded += timed(stages["download_file_content"], fetch_file, app, session, url, cache)
+    session.close()
+    return stages, len(pages), len(assignments), downloaded
+
+
+def run_selenium(app, username, repeat, max_downloads, cache):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    stages = {name: [] for name in ("create_webdriver", "login_to_cms", "navigate_to_lms",
+                                    "extract_all_courses", "extract_assignments", "download_file_content")}
+    assignments, pages = [], 0
+    for _ in range(repeat):
+        driver = timed(stages["create_webdriver"], app.create_webdriver)
+        try:
+            wait = WebDriverWait(driver, 10)
+            if not timed(stages["login_to_cms"], app.login_to_cms, wait, driver, username, PASSWORD):
+                raise SystemExit(f"Login failed for {username}")
+            timed(stages["navigate_to_lms"], app.navigate_to_lms, driver)
+            assignments = timed(stages["extract_all_courses"], app.extract_all_courses, wait, driver)
+
+            options = app.parse_course_options(driver.page_source)
+            pages = len(options)
+            for value, _ in options:
+                driver.get(app.course_url(value))
+                timed(stages["extract_assignments"], app.extract_assignments, driver)
+
+            links = [a["Download Link"] for a in assignments if a["Download Link"]][:max_downloads]
+            downloaded = 0
+            for url in links:
+                downloaded += timed(stages["download_file_content"], fetch_file, app, driver, url, cache)
+        finally:
+            app.quit_webdriver(driver)
+    return stages, pages, len(assignments), downloaded
+
+
+def compare(current, baseline, threshold):
+    """Return the stages whose median got slower than baseline by more than threshold"""
+    regressions = []
+    for scenario, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        for stage, stats in result["stages"].items():
+            before = previous["stages"].get(stage, {}).get("median_ms")
+            if before and stats["median_ms"] > before * (1 + threshold):
+                regressions.append(f"{scenario}/{stage}: {before:.2f} -> {stats['median_ms']:.2f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stage-level benchmark of the scraping pipeline")
+    parser.add_argument("--courses", type=int, nargs="+", default=[5, 20, 100])
+    parser.add_argument("--assignments-per-course", type=int, default=4)
+    parser.add_argument("--file-kb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-downloads", type=int, default=20)
+    parser.add_argument("--selenium", action="store_true", help="time the Chromium engine instead of HTTP")
+    parser.add_argument("--landing-pages", action="store_true", help="link assignments to HTML handout pages")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    with open(LAYOUT, encoding="utf-8") as f:
+        layout = f.read()
+    accounts = {f"bench-{n}": make_account(PASSWORD, n, args.assignments_per_course) for n in args.courses}
+    server, base_url = start_mock_server(accounts=accounts, lms_layout=layout, file_size=args.file_kb * 1024,
+                                         landing_pages=args.landing_pages)
+
+    # The app reads its portal URLs at import time
+    os.environ["BUKC_CMS_BASE"] = base_url
+    os.environ["BUKC_LMS_BASE"] = base_url
+    os.environ.setdefault("BUKC_DOWNLOAD_CACHE_DIR", tempfile.mkdtemp(prefix="bukc-bench-"))
+    import scraper as app
+
+    engine = "selenium" if args.selenium else "http"
+    results = {
+        "engine": engine,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "scenarios": {},
+    }
+    for n in args.courses:
+        tracemalloc.start()
+        start = time.perf_counter()
+        run = run_selenium if args.selenium else run_http
+        # The mock's files depend only on their id, so a shared cache would turn later scenarios' downloads
+        # into revalidations of files an earlier scenario fetched
+        cache = app.DownloadCache(tempfile.mkdtemp(prefix=f"bukc-bench-{n}-"))
+        stages, pages, n_assignments, downloaded = run(app, f"bench-{n}", args.repeat, args.max_downloads, cache)
+        wall = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        extract_s = statistics.median(stages["extract_all_courses"])
+        download_s = sum(stages["download_file_content"]) or float("nan")
+        results["scenarios"][f"{n}_courses"] = {
+            "courses": pages,
+            "assignments": n_assignments,
+            "wall_s": round(wall, 3),
+            "stages": {stage: summarize(samples) for stage, samples in stages.items() if samples},
+            "throughput": {
+                "courses_per_s": round(pages / extract_s, 1),
+                "assignments_per_s": round(n_assignments / extract_s, 1),
+                "download_mb_per_s": round(downloaded / (1024 * 1024) / download_s, 2),
+            },
+            "memory": {"python_peak_mb": round(peak / (1024 * 1024), 2), "max_rss_mb": max_rss_mb()},
+        }
+
+        scenario = results["scenarios"][f"{n}_courses"]
+        print(f"\n{n} courses ({engine}): {scenario['throughput']['courses_per_s']} courses/s, "
+              f"peak heap {scenario['memory']['python_peak_mb']} MB, max RSS {scenario['memory']['max_rss_mb']} MB")
+        for stage, stats in scenario["stages"].items():
+            print(f"  {stage:<24} median {stats['median_ms']:>9.2f} ms   p95 {stats['p95_ms']:>9.2f} ms   n={stats['n']}")
+
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
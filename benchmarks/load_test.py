@@ -0,0 +1,623 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Concurrent multi-session load test of the Streamlit app, with a capacity report.
+
+    python benchmarks/load_test.py [--levels 1 5 10 25] [--output capacity.json]
+    python benchmarks/load_test.py --engine selenium --levels 1 2 4 --memory-mb 4096
+
+For every concurrency level a fresh `streamlit run Untitled8.py` is started
+against a local mock_cms server, and that many simulated browser tabs talk
+to it over Streamlit's own websocket protocol. Each tab loads the page, logs
+in through the form (polling the progress fragment like the browser's timer
+does), downloads a few assignments through their fragments, switches the
+assignments view a few times (full-page reruns) and, once every tab at that
+level is done, logs out. With --engine selenium the mock writes its login
+form from a script, so every session falls back to a pooled Chromium (needs
+Chrome and chromedriver).
+
+While a level runs, the server process tree is sampled for peak RSS and the
+number of Chromium processes (needs psutil), and the scheduler's queue depth
+is read from the app's /metrics endpoint. Each level reports latency
+percentiles per step and the share of sessions with a failed step; the
+capacity is the highest level whose failure rate and p95 latencies stay
+within the given limits.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter, defaultdict
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from websockets.asyncio.client import connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_cms import make_account, start_mock_server  # noqa: E402
+
+APP = os.path.join(ROOT, "Untitled8.py")
+LAYOUT = os.path.join(ROOT, "benchmarks", "fixtures", "lms_layout.html")
+PASSWORD = "load"
+VIEWS = ["By urgency", "Due in 7 days", "Overdue", "By course"]
+STEPS = ["page_load", "login_scrape", "download", "rerun"]
+
+
+class StepFailed(Exception):
+    """A simulated user could not complete a step"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class SimulatedSession:
+    """
+    One browser tab: a websocket to the Streamlit server, the elements of the
+    page it last rendered, and the widget values it sends with every rerun.
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.ws = None
+        self.reader = None
+        self.page_hash = ""
+        self.session_id = ""
+        self.elements = {}      # delta path -> (element type, proto, fragment id)
+        self.values = {}        # widget id -> WidgetState sent with every rerun
+        self.auto_reruns = {}   # fragment id -> interval of st.fragment(run_every=...)
+        self.finished = asyncio.Queue()
+        self.operations = {}    # backend operation request id -> future for its response
+
+    async def open(self):
+        url = self.base_url.replace("http://", "ws://", 1) + "/_stcore/stream"
+        self.ws = await connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=self.timeout)
+        self.reader = asyncio.create_task(self._read())
+        await self.rerun()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+        if self.reader is not None:
+            await asyncio.gather(self.reader, return_exceptions=True)
+
+    async def _read(self):
+        async for data in self.ws:
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = msg.new_session.page_script_hash
+                self.session_id = msg.new_session.initialize.session_id or self.session_id
+                if not msg.new_session.fragment_ids_this_run:
+                    # A full run redraws the whole page
+                    self.elements = {}
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                name = element.WhichOneof("type")
+                self.elements[tuple(msg.metadata.delta_path)] = (name, getattr(element, name), msg.delta.fragment_id)
+            elif kind == "auto_rerun":
+                self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "stop_auto_rerun":
+                for fragment_id in msg.stop_auto_rerun.fragment_ids:
+                    self.auto_reruns.pop(fragment_id, None)
+            elif kind == "script_finished":
+                self.finished.put_nowait(msg.script_finished)
+            elif kind == "backend_operation_response":
+                future = self.operations.pop(msg.backend_operation_response.request_id, None)
+                if future is not None and not future.done():
+                    future.set_result(msg.backend_operation_response)
+        self.finished.put_nowait(None)
+
+    async def rerun(self, fragment_id="", triggers=(), auto=False):
+        """Send a rerun like the browser does and wait until the script (or fragment) has finished"""
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.page_script_hash = self.page_hash
+        state.fragment_id = fragment_id
+        state.is_auto_rerun = auto
+        for value in self.values.values():
+            state.widget_states.widgets.add().CopyFrom(value)
+        for widget_id in triggers:
+            trigger = state.widget_states.widgets.add()
+            trigger.id = widget_id
+            trigger.trigger_value = True
+        while not self.finished.empty():
+            self.finished.get_nowait()
+        await self.ws.send(msg.SerializeToString())
+
+        while True:
+            status = await asyncio.wait_for(self.finished.get(), self.timeout)
+            if status is None:
+                raise StepFailed("The server closed the connection")
+            if status == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                raise StepFailed("The app failed to compile")
+            # A fragment calling st.rerun() is followed by a full run
+            if status != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        exceptions = [element.message for name, element, _ in self.elements.values() if name == "exception"]
+        if exceptions:
+            raise StepFailed(f"The app raised: {exceptions[0]}")
+
+    def find_all(self, kind, label_prefix=""):
+        return [(element, fragment_id) for name, element, fragment_id in self.elements.values()
+                if name == kind and element.label.startswith(label_prefix)]
+
+    def find(self, kind, label_prefix=""):
+        found = self.find_all(kind, label_prefix)
+        return found[0] if found else (None, None)
+
+    def alerts(self):
+        return [element.body for name, element, _ in self.elements.values() if name == "alert"]
+
+    def set_value(self, widget_id, **value):
+        state = WidgetState(id=widget_id, **value)
+        self.values[widget_id] = state
+
+    async def file_url(self, button):
+        """The media URL behind a download button, asking the server to generate deferred data first"""
+        if button.url or not button.deferred_file_id:
+            return button.url
+        msg = BackMsg()
+        request = msg.backend_operation_request
+        request.request_id = f"load-{id(button)}-{time.monotonic_ns()}"
+        request.session_id = self.session_id
+        request.deferred_file.file_id = button.deferred_file_id
+        future = asyncio.get_running_loop().create_future()
+        self.operations[request.request_id] = future
+        await self.ws.send(msg.SerializeToString())
+        response = await asyncio.wait_for(future, self.timeout)
+        if response.error_msg:
+            raise StepFailed(response.error_msg)
+        return response.deferred_file.url
+
+    def fetch(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=self.timeout) as response:
+            return response.read()
+
+
+class StreamlitServer:
+    """`streamlit run Untitled8.py` in a child process, with the app pointed at the mock"""
+
+    def __init__(self, env, log_path):
+        self.port = free_port()
+        self.metrics_port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.metrics_url = f"http://127.0.0.1:{self.metrics_port}/metrics"
+        self.log = open(log_path, "a")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP,
+             "--server.headless", "true", "--server.port", str(self.port),
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+            cwd=ROOT, env={**env, "BUKC_METRICS_PORT": str(self.metrics_port)},
+            stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"Streamlit exited with code {self.process.returncode}; see {self.log.name}")
+            try:
+                with urllib.request.urlopen(self.url + "/_stcore/health", timeout=2):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise SystemExit(f"Streamlit did not become healthy within {timeout}s; see {self.log.name}")
+
+    def stop(self):
+        # Browsers left behind by the pool go down with the server
+        children = []
+        if psutil is not None:
+            try:
+                children = psutil.Process(self.process.pid).children(recursive=True)
+            except psutil.Error:
+                pass
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        for child in children:
+            try:
+                child.kill()
+            except psutil.Error:
+                pass
+        self.log.close()
+
+
+class Sampler(threading.Thread):
+    """Samples the server's process tree and scheduler gauges until stopped, keeping the peaks"""
+
+    def __init__(self, server, interval):
+        super().__init__(daemon=True)
+        self.server = server
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.peaks = defaultdict(float)
+        self.last = {}
+
+    def sample(self):
+        values = {}
+        if psutil is not None:
+            try:
+                root = psutil.Process(self.server.process.pid)
+                processes = [root] + root.children(recursive=True)
+            except psutil.Error:
+                processes = []
+            rss = 0
+            chrome = drivers = 0
+            for process in processes:
+                try:
+                    rss += process.memory_info().rss
+                    name = process.name().lower()
+                except psutil.Error:
+                    continue
+                if "chromedriver" in name:
+                    drivers += 1
+                elif "chrom" in name:
+                    chrome += 1
+            values.update(rss_mb=rss / (1024 * 1024), chrome_processes=chrome, chromedrivers=drivers)
+        try:
+            with urllib.request.urlopen(self.server.metrics_url, timeout=2) as response:
+                for line in response.read().decode().splitlines():
+                    for gauge in ("scheduler_queue_depth", "scheduler_running_jobs"):
+                        if line.startswith(f"bukc_{gauge} "):
+                            values[gauge] = float(line.split()[1])
+        except OSError:
+            pass
+        for key, value in values.items():
+            self.peaks[key] = max(self.peaks[key], value)
+        self.last = values
+        return values
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+
+
+def record(results, step, start, error=None):
+    results.append({"step": step, "seconds": time.perf_counter() - start, "error": error})
+
+
+async def log_in(session, username, password, timeout):
+    """Submit the login form and poll the progress fragment until the assignments page shows"""
+    user_field, _ = session.find("text_input", "Enter Enrollment Number")
+    password_field, _ = session.find("text_input", "Enter Password")
+    submit, _ = session.find("button", "Login & Extract")
+    if user_field is None or password_field is None or submit is None:
+        raise StepFailed("Login form not found")
+    session.set_value(user_field.id, string_value=username)
+    session.set_value(password_field.id, string_value=password)
+    await session.rerun(triggers=[submit.id])
+
+    deadline = time.monotonic() + timeout
+    while session.find("button", "Logout")[0] is None:
+        if session.find("button", "Login & Extract")[0] is not None:
+            # Back at the form: the scrape failed or the credentials were rejected
+            raise StepFailed("; ".join(session.alerts()) or "Returned to the login form")
+        if time.monotonic() > deadline:
+            raise StepFailed("Timed out waiting for the assignments")
+        fragment_id, interval = next(iter(session.auto_reruns.items()), ("", 0.5))
+        await asyncio.sleep(interval)
+        await session.rerun(fragment_id=fragment_id, auto=bool(fragment_id))
+
+
+async def download(session, button, fragment_id):
+    """Click one assignment's download button (a fragment rerun) and fetch the file it offers"""
+    await session.rerun(fragment_id=fragment_id, triggers=[button.id])
+    saves = [save for save, fragment in session.find_all("download_button", "💾 Save") if fragment == fragment_id]
+    if not saves:
+        raise StepFailed("; ".join(session.alerts()) or "No file offered after the download")
+    content = await asyncio.to_thread(session.fetch, await session.file_url(saves[0]))
+    if not content:
+        raise StepFailed("Empty download")
+
+
+async def simulate_user(server_url, username, args, delay, arrive, all_done, results):
+    """Load the page, log in, download, switch views, then log out once every user at this level is done"""
+    await asyncio.sleep(delay)
+    session = SimulatedSession(server_url, args.timeout)
+    step = "page_load"
+    try:
+        start = time.perf_counter()
+        await session.open()
+        record(results, step, start)
+
+        await asyncio.sleep(random.uniform(0, args.think))
+        step = "login_scrape"
+        start = time.perf_counter()
+        await log_in(session, username, PASSWORD, args.timeout)
+        record(results, step, start)
+
+        step = "download"
+        for button, fragment_id in session.find_all("button", "📥 Download ")[:args.downloads]:
+            await asyncio.sleep(random.uniform(0, args.think))
+            start = time.perf_counter()
+            try:
+                await download(session, button, fragment_id)
+                record(results, step, start)
+            except (StepFailed, OSError) as e:
+                record(results, step, start, str(e))
+
+        step = "rerun"
+        view, _ = session.find("radio", "View")
+        for i in range(args.reruns if view is not None else 0):
+            await asyncio.sleep(random.uniform(0, args.think))
+            session.set_value(view.id, string_value=VIEWS[i % len(VIEWS)])
+            start = time.perf_counter()
+            await session.rerun()
+            record(results, step, start)
+    except Exception as e:
+        record(results, step, start, str(e) if isinstance(e, StepFailed) else f"{type(e).__name__}: {e}")
+
+    # Everyone stays logged in until the whole level is through, so the peak reflects N live sessions
+    arrive()
+    await all_done.wait()
+    try:
+        logout, _ = session.find("button", "Logout")
+        if logout is not None:
+            await session.rerun(triggers=[logout.id])
+    except Exception:
+        pass
+    finally:
+        await session.close()
+
+
+async def run_level(server_url, usernames, args):
+    results = {username: [] for username in usernames}
+    all_done = asyncio.Event()
+    arrived = Counter()
+
+    def arrive():
+        arrived["users"] += 1
+        if arrived["users"] == len(usernames):
+            all_done.set()
+
+    await asyncio.gather(*(
+        simulate_user(server_url, username, args, i * args.ramp / len(usernames), arrive, all_done,
+                      results[username])
+        for i, username in enumerate(usernames)
+    ))
+    return results
+
+
+async def warm_up(server_url, timeout):
+    """One throwaway page load, so the app is imported before the baseline is taken"""
+    session = SimulatedSession(server_url, timeout)
+    try:
+        await session.open()
+    finally:
+        await session.close()
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)], 3)
+
+
+def summarize(results, expected_downloads, args):
+    steps = {}
+    for step in STEPS:
+        samples = [r for user in results.values() for r in user if r["step"] == step]
+        ok = sorted(r["seconds"] for r in samples if not r["error"])
+        steps[step] = {
+            "n": len(samples),
+            "failures": sum(1 for r in samples if r["error"]),
+            "p50_s": percentile(ok, 0.5),
+            "p95_s": percentile(ok, 0.95),
+            "p99_s": percentile(ok, 0.99),
+            "max_s": round(ok[-1], 3) if ok else None,
+        }
+
+    failed = 0
+    for user in results.values():
+        logged_in = any(r["step"] == "login_scrape" and not r["error"] for r in user)
+        downloads = sum(1 for r in user if r["step"] == "download" and not r["error"])
+        reruns = sum(1 for r in user if r["step"] == "rerun" and not r["error"])
+        if not logged_in or downloads < expected_downloads or reruns < args.reruns:
+            failed += 1
+    errors = Counter(r["error"] for user in results.values() for r in user if r["error"])
+    return steps, failed, [{"error": error, "count": count} for error, count in errors.most_common(5)]
+
+
+def run_levels(args, base_url, env, log_path):
+    expected_downloads = min(args.downloads, args.courses * args.assignments_per_course)
+    levels = []
+    for level in args.levels:
+        print(f"\n{level} concurrent session(s)", flush=True)
+        server = StreamlitServer(env, log_path)
+        try:
+            server.wait_ready()
+            asyncio.run(warm_up(server.url, args.timeout))
+            time.sleep(1)
+            sampler = Sampler(server, args.sample_interval)
+            baseline = sampler.sample()
+            sampler.start()
+            start = time.perf_counter()
+            results = asyncio.run(run_level(server.url, [f"load-{level}-{i}" for i in range(level)], args))
+            wall = time.perf_counter() - start
+            sampler.stop()
+        finally:
+            server.stop()
+
+        steps, failed, errors = summarize(results, expected_downloads, args)
+        peaks = sampler.peaks
+        peak_rss = peaks.get("rss_mb")
+        summary = {
+            "sessions": level,
+            "failed_sessions": failed,
+            "failure_rate": round(failed / level, 4),
+            "wall_s": round(wall, 2),
+            "steps": steps,
+            "baseline_rss_mb": round(baseline["rss_mb"], 1) if "rss_mb" in baseline else None,
+            "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+            "rss_per_session_mb": round((peak_rss - baseline["rss_mb"]) / level, 1) if peak_rss is not None else None,
+            "peak_chrome_processes": int(peaks["chrome_processes"]) if "chrome_processes" in peaks else None,
+            "peak_chromedrivers": int(peaks["chromedrivers"]) if "chromedrivers" in peaks else None,
+            "peak_queue_depth": int(peaks["scheduler_queue_depth"]) if "scheduler_queue_depth" in peaks else None,
+            "peak_running_jobs": int(peaks["scheduler_running_jobs"]) if "scheduler_running_jobs" in peaks else None,
+            "errors": errors,
+        }
+        levels.append(summary)
+
+        print(f"  failed sessions {failed}/{level}, peak RSS {summary['peak_rss_mb']} MB "
+              f"({summary['rss_per_session_mb']} MB/session), chromedrivers {summary['peak_chromedrivers']}, "
+              f"Chromium processes {summary['peak_chrome_processes']}, peak queue {summary['peak_queue_depth']}")
+        for step, stats in steps.items():
+            p50, p95, p99 = (f"{stats[q]:.3f}" if stats[q] is not None else "-" for q in ("p50_s", "p95_s", "p99_s"))
+            print(f"  {step:<14} p50 {p50:>8} s   p95 {p95:>8} s   p99 {p99:>8} s   "
+                  f"failures {stats['failures']}/{stats['n']}")
+        for error in errors:
+            print(f"  {error['count']}x {error['error']}")
+    return levels
+
+
+def capacity(levels, args):
+    """The highest level within the failure and latency limits, plus a memory-based projection"""
+    def within_limits(level):
+        steps = level["steps"]
+        return (
+            level["failure_rate"] <= args.max_failure_rate
+            and (steps["login_scrape"]["p95_s"] or math.inf) <= args.login_slo
+            and (steps["download"]["p95_s"] or 0) <= args.download_slo
+            and (steps["rerun"]["p95_s"] or 0) <= args.rerun_slo
+        )
+
+    passing = [level for level in levels if within_limits(level)]
+    # Levels are only trusted up to the first one that breaks the limits
+    supported = 0
+    for level in sorted(levels, key=lambda level: level["sessions"]):
+        if not within_limits(level):
+            break
+        supported = level["sessions"]
+
+    report = {
+        "max_failure_rate": args.max_failure_rate,
+        "login_slo_s": args.login_slo,
+        "download_slo_s": args.download_slo,
+        "rerun_slo_s": args.rerun_slo,
+        "supported_sessions": supported,
+        "first_failing_level": next((level["sessions"] for level in sorted(levels, key=lambda level: level["sessions"])
+                                     if not within_limits(level)), None),
+    }
+    per_session = [level["rss_per_session_mb"] for level in passing if level["rss_per_session_mb"] is not None]
+    baselines = [level["baseline_rss_mb"] for level in levels if level["baseline_rss_mb"] is not None]
+    if per_session and baselines:
+        report["rss_per_session_mb"] = max(per_session)
+        report["baseline_rss_mb"] = max(baselines)
+        if args.memory_mb:
+            headroom = args.memory_mb * (1 - args.memory_reserve) - report["baseline_rss_mb"]
+            report["memory_mb"] = args.memory_mb
+            report["sessions_by_memory"] = max(0, int(headroom // max(report["rss_per_session_mb"], 0.1)))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent multi-session load test of the Streamlit app")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 5, 10, 25], help="concurrent sessions per run")
+    parser.add_argument("--engine", choices=["http", "selenium"], default="http",
+                        help="selenium makes the mock browser-only, so every login uses Chromium")
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--assignments-per-course", type=int, default=3)
+    parser.add_argument("--file-kb", type=int, default=256)
+    parser.add_argument("--downloads", type=int, default=3, help="assignments each session downloads")
+    parser.add_argument("--reruns", type=int, default=3, help="full-page view switches each session makes")
+    parser.add_argument("--think", type=float, default=1.0, help="maximum random pause between steps (s)")
+    parser.add_argument("--ramp", type=float, default=5.0, help="spread session starts over this many seconds")
+    parser.add_argument("--timeout", type=float, default=300.0, help="give up on a step after this many seconds")
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--max-failure-rate", type=float, default=0.01)
+    parser.add_argument("--login-slo", type=float, default=60.0, help="p95 login-to-assignments limit (s)")
+    parser.add_argument("--download-slo", type=float, default=10.0, help="p95 download limit (s)")
+    parser.add_argument("--rerun-slo", type=float, default=2.0, help="p95 full-page rerun limit (s)")
+    parser.add_argument("--memory-mb", type=int, help="container memory, to project sessions per container")
+    parser.add_argument("--memory-reserve", type=float, default=0.2, help="share of --memory-mb kept free")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the capacity report as JSON to this path")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.engine == "selenium" and shutil.which("chromedriver") is None:
+        print("chromedriver is not on PATH; Selenium logins will likely fail")
+    if psutil is None:
+        print("psutil is not installed; skipping memory and browser process counts")
+
+    with open(LAYOUT, encoding="utf-8") as f:
+        layout = f.read()
+    accounts = {f"load-{level}-{i}": make_account(PASSWORD, args.courses, args.assignments_per_course)
+                for level in args.levels for i in range(level)}
+    mock, base_url = start_mock_server(accounts=accounts, lms_layout=layout, file_size=args.file_kb * 1024,
+                                       browser_only=args.engine == "selenium")
+
+    work_dir = tempfile.mkdtemp(prefix="bukc-load-")
+    env = {
+        **os.environ,
+        "BUKC_CMS_BASE": base_url,
+        "BUKC_LMS_BASE": base_url,
+        "BUKC_DOWNLOAD_CACHE_DIR": os.path.join(work_dir, "downloads"),
+        "BUKC_BROWSER_CACHE_DIR": os.path.join(work_dir, "browser-cache"),
+    }
+    log_path = os.path.join(work_dir, "streamlit.log")
+    print(f"Mock portal on {base_url}; Streamlit logs in {log_path}")
+
+    try:
+        levels = run_levels(args, base_url, env, log_path)
+    finally:
+        mock.shutdown()
+
+    report = capacity(levels, args)
+    print(f"\nCapacity ({args.engine} engine): {report['supported_sessions']} concurrent sessions within "
+          f"{args.max_failure_rate:.0%} failures, p95 login {args.login_slo:g}s, "
+          f"download {args.download_slo:g}s, rerun {args.rerun_slo:g}s")
+    if report["first_failing_level"] is not None:
+        print(f"  limits first broken at {report['first_failing_level']} sessions")
+    if "rss_per_session_mb" in report:
+        print(f"  memory: {report['baseline_rss_mb']} MB idle + {report['rss_per_session_mb']} MB per session")
+    if "sessions_by_memory" in report:
+        print(f"  {report['memory_mb']} MB container ({args.memory_reserve:.0%} reserved): "
+              f"about {report['sessions_by_memory']} sessions by memory")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "config": vars(args),
+                "pool": {name: value for name, value in os.environ.items() if name.startswith("BUKC_")},
+                "levels": levels,
+                "capacity": report,
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
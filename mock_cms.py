@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Local stand-in for the Bahria CMS and LMS so the login/scrape flow can be
+exercised offline.
+
+Run it with:
+
+    python mock_cms.py --port 8765
+
+and point the app at it:
+
+    BUKC_CMS_BASE=http://127.0.0.1:8765 BUKC_LMS_BASE=http://127.0.0.1:8765 streamlit run Untitled8.py
+
+Both portals are served from the same host; the CMS lives under /Logins and
+/Sys, the LMS under /Student, mirroring the real URL paths.
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import secrets
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CAMPUSES = [("1", "Islamabad E-8 Campus"), ("2", "Karachi Campus"), ("3", "Lahore Campus")]
+ROLES = [("1", "Student"), ("2", "Parent")]
+STATIC_TYPES = {
+    ".css": "text/css", ".js": "application/javascript", ".png": "image/png", ".jpg": "image/jpeg",
+    ".svg": "image/svg+xml", ".woff2": "font/woff2", ".woff": "font/woff", ".ttf": "font/ttf",
+}
+
+
+def make_account(password, n_courses=3, assignments_per_course=3):
+    """Build a synthetic account with n_courses courses and some assignments each"""
+    courses = []
+    for c in range(n_courses):
+        assignments = []
+        for a in range(assignments_per_course):
+            file_id = f"{c}-{a}"
+            assignments.append({
+                "name": f"Assignment {a + 1}",
+                "status": "Deadline Exceeded" if a == 0 else "Submit",
+                "deadline": f"{10 + a} December 2026 - 11:59 pm",
+                "file_id": file_id,
+            })
+        courses.append({
+            "id": str(1000 + c),
+            "name": f"CSC-{110 + c} Course {c + 1}",
+            "assignments": assignments,
+        })
+    return {"password": password, "courses": courses}
+
+
+def default_accounts():
+    return {"02-134212-001": make_account("secret")}
+
+
+class MockState:
+    """
+    Accounts and sessions behind the mock. lms_layout is an optional recorded
+    LMS page whose "<!-- content -->" marker is replaced with the course
+    dropdown and assignments table, so pages have realistic size; file_size
+    sets the size of every downloadable handout and asset_size that of the
+    stylesheets, scripts, images and fonts the layout references. With
+    landing_pages, assignment links lead to an HTML handout page (a viewer
+    iframe, decoy links and the real download link) instead of the file.
+    interrupt_after drops the connection after that many bytes of every
+    full (non-Range) file download, to exercise resumed downloads.
+    browser_only writes the login form's hidden ASP.NET fields from a script,
+    so the HTTP engine gives up and the app falls back to Chromium.
+    """
+
+    def __init__(self, accounts=None, lms_layout=None, file_size=1792, asset_size=64 * 1024,
+                 landing_pages=False, interrupt_after=None, browser_only=False):
+        self.accounts = accounts if accounts is not None else default_accounts()
+        self.lms_layout = lms_layout
+        self.file_size = file_size
+        self.asset_size = asset_size
+        self.landing_pages = landing_pages
+        self.interrupt_after = interrupt_after
+        self.browser_only = browser_only
+        self.cms_sessions = {}   # ASP.NET_SessionId -> username
+        self.lms_sessions = {}   # PHPSESSID -> username
+        self.lock = threading.Lock()
+
+    def file_bytes(self, file_id):
+        chunk = f"%PDF-1.4\n% mock handout {file_id}\n".encode()
+        return (chunk * (self.file_size // len(chunk) + 1))[:self.file_size]
+
+    def asset_bytes(self, path, ext):
+        # Comment padding keeps stylesheets and scripts valid; the rest is opaque filler
+        if ext in (".css", ".js"):
+            chunk = f"/* mock asset {path} */\n".encode()
+        else:
+            chunk = hashlib.sha256(path.encode()).digest()
+        return (chunk * (self.asset_size // len(chunk) + 1))[:self.asset_size]
+
+    def lms_page(self, title, content):
+        if self.lms_layout:
+            return self.lms_layout.replace("<!-- content -->", content)
+        return _page(title, content)
+
+
+def _page(title, body):
+    return f"<html><head><title>{title}</title></head><body>{body}</body></html>"
+
+
+def _options(pairs, selected=None):
+    return "".join(
+        f'<option value="{v}"{" selected" if v == selected else ""}>{html.escape(t)}</option>'
+        for v, t in pairs
+    )
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- helpers -----------------------------------------------------------
+    def _cookies(self):
+        jar = {}
+        for part in self.headers.get("Cookie", "").split(";"):
+            if "=" in part:
+                k, v = part.strip().split("=", 1)
+                jar[k] = v
+        return jar
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or []):
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _redirect(self, location, headers=None):
+        self._send(302, "", headers=[("Location", location)] + list(headers or []))
+
+    def _lms_user(self):
+        return self.state.lms_sessions.get(self._cookies().get("PHPSESSID"))
+
+    # -- routing -----------------------------------------------------------
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        path = parsed.path
+        if path == "/Logins/Student/Login.aspx":
+            return self._login_form()
+        if path == "/Sys/Student/Dashboard.aspx":
+            if self.state.cms_sessions.get(self._cookies().get("ASP.NET_SessionId")):
+                return self._send(200, _page("Dashboard", "<h1>Welcome</h1>"))
+            return self._redirect("/Logins/Student/Login.aspx")
+        if path == "/Sys/Common/GoToLMS.aspx":
+            return self._go_to_lms()
+        if path == "/Student/Assignments.php":
+            return self._assignments(query.get("oc", [None])[0])
+        if path == "/Student/Handout.php":
+            return self._handout(query.get("id", [""])[0])
+        if path == "/Student/Viewer.php":
+            return self._send(200, _page("Viewer", "<p>Loading document viewer...</p>"))
+        if path == "/Student/Download.php":
+            return self._download(query.get("id", [""])[0])
+        if path.startswith(("/plugins/", "/dist/")):
+            return self._static(path)
+        self._send(404, _page("Not Found", "Not Found"))
+
+    def do_POST(self):
+        parsed = urllib.parse.urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+        if parsed.path == "/Logins/Student/Login.aspx":
+            return self._login_post({k: v[0] for k, v in form.items()})
+        self._send(404, _page("Not Found", "Not Found"))
+
+    # -- CMS ---------------------------------------------------------------
+    def _login_form(self, error=""):
+        token = secrets.token_hex(8)
+        hidden = f"""
+          <input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="vs-{token}" />
+          <input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="C2EE9ABB" />
+          <input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="ev-{token}" />"""
+        if self.state.browser_only:
+            hidden = f"<script>document.write({json.dumps(hidden)});</script>"
+        body = f"""
+        <form method="post" action="./Login.aspx" id="form1">{hidden}
+          <span id="BodyPH_lblError">{html.escape(error)}</span>
+          <input name="ctl00$BodyPH$tbEnrollment" type="text" id="BodyPH_tbEnrollment" />
+          <input name="ctl00$BodyPH$tbPassword" type="password" id="BodyPH_tbPassword" />
+          <select name="ctl00$BodyPH$ddlInstituteID" id="BodyPH_ddlInstituteID">
+            <option value="">Select Campus</option>{_options(CAMPUSES)}
+          </select>
+          <select name="ctl00$BodyPH$ddlSubUserType" id="BodyPH_ddlSubUserType">
+            <option value="None">Select Role</option>{_options(ROLES)}
+          </select>
+          <input type="submit" name="ctl00$BodyPH$btnLogin" value="Sign In" id="BodyPH_btnLogin" />
+        </form>"""
+        self._send(200, _page("Login", body))
+
+    def _login_post(self, form):
+        if not form.get("__VIEWSTATE", "").startswith("vs-") or not form.get("__EVENTVALIDATION", "").startswith("ev-"):
+            return self._send(500, _page("Error", "Validation of viewstate MAC failed."))
+        username = form.get("ctl00$BodyPH$tbEnrollment", "")
+        password = form.get("ctl00$BodyPH$tbPassword", "")
+        account = self.state.accounts.get(username)
+        if (
+            account is None
+            or account["password"] != password
+            or form.get("ctl00$BodyPH$ddlInstituteID") != "2"
+            or form.get("ctl00$BodyPH$ddlSubUserType") != "1"
+        ):
+            return self._login_form("Invalid Enrollment or Password")
+        sid = secrets.token_hex(12)
+        with self.state.lock:
+            self.state.cms_sessions[sid] = username
+        self._redirect("/Sys/Student/Dashboard.aspx",
+                       [("Set-Cookie", f"ASP.NET_SessionId={sid}; path=/; HttpOnly")])
+
+    def _go_to_lms(self):
+        username = self.state.cms_sessions.get(self._cookies().get("ASP.NET_SessionId"))
+        if not username:
+            return self._redirect("/Logins/Student/Login.aspx")
+        sid = secrets.token_hex(12)
+        with self.state.lock:
+            self.state.lms_sessions[sid] = username
+        self._redirect("/Student/Assignments.php",
+                       [("Set-Cookie", f"PHPSESSID={sid}; path=/")])
+
+    # -- LMS ---------------------------------------------------------------
+    def _assignments(self, course_id):
+        username = self._lms_user()
+        if not username:
+            return self._redirect("/Logins/Student/Login.aspx")
+        courses = self.state.accounts[username]["courses"]
+        select = (
+            '<select name="courseName" id="courseName" '
+            "onchange=\"window.location.href='Assignments.php?oc='+this.value\">"
+            '<option value="">Select Course</option>'
+            + _options([(c["id"], c["name"]) for c in courses], selected=course_id)
+            + "</select>"
+        )
+        table = ""
+        course = next((c for c in courses if c["id"] == course_id), None)
+        if course is not None:
+            rows = "".join(
+                "<tr>"
+                f"<td>{i + 1}</td>"
+                f"<td>{html.escape(a['name'])}</td>"
+                f'<td><a href="{"Handout" if self.state.landing_pages else "Download"}.php?id={a["file_id"]}">Download</a></td>'
+                "<td>-</td><td>-</td><td>-</td>"
+                f"<td>{a['status']}</td>"
+                f"<td>{a['deadline']}</td>"
+                "</tr>"
+                for i, a in enumerate(course["assignments"])
+            )
+            table = (
+                "<table><tr><th>#</th><th>Title</th><th>File</th><th>Submission</th>"
+                "<th>Marks</th><th>Remarks</th><th>Status</th><th>Deadline</th></tr>"
+                f"{rows}</table>"
+            )
+        self._send(200, self.state.lms_page("Assignments", select + table))
+
+    def _handout(self, file_id):
+        if not self._lms_user():
+            return self._redirect("/Logins/Student/Login.aspx")
+        body = (
+            f'<iframe src="Viewer.php?id={file_id}"></iframe>'
+            f'<a href="/files/missing_{file_id}.pdf">Old copy</a>'
+            f'<a href="Handout.php?id={file_id}&amp;download=page">Download page</a>'
+            f'<a href="Download.php?id={file_id}">Download handout</a>'
+        )
+        self._send(200, _page("Handout", body))
+
+    def _download(self, file_id):
+        if not self._lms_user():
+            return self._redirect("/Logins/Student/Login.aspx")
+        body = self.state.file_bytes(file_id)
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        validators = [("ETag", etag), ("Last-Modified", "Mon, 01 Sep 2025 08:00:00 GMT")]
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", headers=validators)
+        headers = [("Content-Disposition", f'attachment; filename="handout_{file_id}.pdf"'),
+                   ("Accept-Ranges", "bytes")] + validators
+
+        # Honour "bytes=N-" resumes unless If-Range names an older version
+        requested = self.headers.get("Range", "")
+        if requested.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            start = int(requested[len("bytes="):].split("-")[0] or 0)
+            if start >= len(body):
+                return self._send(416, b"", headers=[("Content-Range", f"bytes */{len(body)}")])
+            return self._send(206, body[start:], "application/pdf",
+                              headers + [("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")])
+
+        if self.state.interrupt_after is not None and self.command == "GET" and len(body) > self.state.interrupt_after:
+            # Promise the whole file, send part of it and hang up
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in headers:
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body[:self.state.interrupt_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._send(200, body, "application/pdf", headers)
+
+
+    # -- static assets -----------------------------------------------------
+    def _static(self, path):
+        ext = path[path.rfind("."):] if "." in path else ""
+        if ext not in STATIC_TYPES:
+            return self._send(404, _page("Not Found", "Not Found"))
+        self._send(200, self.state.asset_bytes(path, ext), STATIC_TYPES[ext],
+                   [("Cache-Control", "public, max-age=86400")])
+
+
+def make_server(host="127.0.0.1", port=0, accounts=None, **state_options):
+    """Create (but do not start) a mock server; port 0 picks a free port"""
+    state = MockState(accounts, **state_options)
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def start_mock_server(host="127.0.0.1", port=0, accounts=None, **state_options):
+    """Start a mock server on a background thread and return (server, base_url)"""
+    server = make_server(host, port, accounts, **state_options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Bahria CMS/LMS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port)
+    print(f"Mock CMS/LMS on http://{args.host}:{args.port} (user 02-134212-001 / secret, Karachi Campus)")
+    server.serve_forever()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Process-wide timing spans and counters for the scraping pipeline.
+
+This lives outside Untitled8.py on purpose: Streamlit re-executes the main
+script on every rerun, but imported modules stay loaded, so the registry
+here survives reruns and is shared by every session and worker thread.
+
+Every finished span is written to the "bukc.metrics" logger as one JSON
+object, and the registry can be scraped in the Prometheus text format,
+either through prometheus_text() or a small HTTP endpoint started with
+start_metrics_server().
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("bukc.metrics")
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in sorted(labels)) + "}"
+
+
+class Metrics:
+    """Recent span durations per stage (for percentiles) plus monotonic counters"""
+
+    def __init__(self, window=2000):
+        self._lock = threading.Lock()
+        self._recent = defaultdict(lambda: deque(maxlen=window))  # stage -> recent durations (s)
+        self._totals = defaultdict(lambda: [0, 0.0])              # stage -> [count, sum]
+        self._counters = defaultdict(float)                        # (name, labels) -> value
+
+    def observe(self, stage, seconds, status="ok", **fields):
+        with self._lock:
+            self._recent[stage].append(seconds)
+            totals = self._totals[stage]
+            totals[0] += 1
+            totals[1] += seconds
+        if status != "ok":
+            self.inc("stage_errors_total", stage=stage)
+        logger.info(json.dumps({"event": "span", "stage": stage, "status": status,
+                                "duration_ms": round(seconds * 1000, 2), **fields}, default=str))
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """Time a block; exceptions are recorded with status=error and re-raised"""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException as e:
+            status = "error" if isinstance(e, Exception) else "aborted"
+            fields["error"] = repr(e)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, status, **fields)
+
+    def timed(self, stage):
+        """Decorator form of span()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self):
+        """{stage: {count, sum_s, p50_s, p95_s}} and {counter: value}"""
+        with self._lock:
+            stages = {}
+            for stage, recent in self._recent.items():
+                ordered = sorted(recent)
+                count, total = self._totals[stage]
+                stages[stage] = {"count": count, "sum_s": total,
+                                 "p50_s": _percentile(ordered, 0.5), "p95_s": _percentile(ordered, 0.95)}
+            counters = {name + _labels(labels): value for (name, labels), value in self._counters.items()}
+        return stages, counters
+
+    def prometheus_text(self, prefix="bukc"):
+        stages, _ = self.snapshot()
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        for stage, stats in sorted(stages.items()):
+            lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="0.5"}} {stats["p50_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="0.95"}} {stats["p95_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["sum_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        with self._lock:
+            counters = sorted(self._counters.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                kind = "counter" if name.endswith("_total") else "gauge"
+                lines.append(f"# TYPE {prefix}_{name} {kind}")
+                typed.add(name)
+            lines.append(f"{prefix}_{name}{_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def start_metrics_server(port, host="0.0.0.0", registry=metrics):
+    """Serve registry.prometheus_text() at /metrics on a daemon thread; returns the server"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
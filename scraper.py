@@ -0,0 +1,2219 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Login, scraping and download logic for the BUKC Assignment Extractor.
+
+Nothing here imports Streamlit: long-running steps report through a
+ProgressReporter, so the Streamlit app (Untitled8.py) and the batch CLI
+(batch_cli.py) each plug in their own. Process-wide objects (the WebDriver
+pool and the caches) are created once per process by their get_* helpers;
+because Streamlit only re-executes the main script, they survive reruns.
+"""
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import Select
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, WebDriverException
+import time
+from bs4 import BeautifulSoup, SoupStrainer
+import urllib.parse
+import requests
+import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# lxml is only used for the fast assignments-table parser; html.parser is the fallback
+try:
+    import lxml.html as lxml_html
+    from lxml import etree
+except ImportError:
+    lxml_html = None
+
+# cryptography encrypts the session vault; without it logins are never reused
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+from io import BytesIO
+import re
+import os
+import threading
+import hashlib
+import hmac
+import secrets
+import json
+import shutil
+import tempfile
+import zipfile
+import itertools
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pipeline_metrics import metrics
+
+logger = logging.getLogger("bukc.scraper")
+
+class ProgressReporter:
+    """
+    Callback interface for long-running steps. This default ignores progress
+    and logs errors; the Streamlit UI and the batch CLI supply their own.
+    """
+
+    def status(self, text):
+        """A one-line description of what is happening now"""
+
+    def progress(self, percent):
+        """Overall completion from 0 to 100"""
+
+    def error(self, text):
+        logger.warning(text)
+
+    def clear(self):
+        """The step finished; drop any status text"""
+
+    def course_done(self, course_name, assignments):
+        """One course's assignments, reported as soon as the course is parsed"""
+
+class JobCancelledError(Exception):
+    """The job was cancelled, timed out or abandoned by its user"""
+
+class ScrapeJob(ProgressReporter):
+    """
+    Runs target(progress) on a background thread with itself as the progress
+    reporter, buffering status, percent and each finished course so a UI can
+    poll snapshot() and render courses as they arrive. The return value of
+    target ends up in result, an exception it raises in exception.
+
+    Cancellation is cooperative: once cancel() is called, the next progress
+    callback raises JobCancelledError inside the worker. A UI calls touch()
+    on every poll so a JobScheduler can tell when its user has gone away.
+    If the job is cancelled after target already returned, cleanup(result)
+    releases whatever the result holds (sessions, leased browsers).
+    """
+
+    def __init__(self, target, name="scrape-job", cleanup=None):
+        self._target = target
+        self._cleanup = cleanup
+        self._lock = threading.Lock()
+        self._courses = {}   # course_name -> assignments, in arrival order
+        self._status = ""
+        self._percent = 0
+        self._errors = []
+        self._done = threading.Event()
+        self._cancel_reason = None
+        self._scheduler = None
+        self.created_at = time.monotonic()
+        self.last_seen = self.created_at
+        self._started_at = None
+        self.result = None
+        self.exception = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self._check_cancelled()
+            result = self._target(self)
+            if self._cancel_reason is not None and self._cleanup is not None:
+                self._cleanup(result)
+            self._check_cancelled()
+            self.result = result
+        except Exception as e:
+            if not isinstance(e, JobCancelledError):
+                logger.exception("Background scrape failed")
+            self.exception = e
+        finally:
+            self._done.set()
+            if self._scheduler is not None:
+                self._scheduler._finished(self, time.monotonic() - self._started_at)
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def touch(self):
+        """Record that someone is still waiting for this job"""
+        self.last_seen = time.monotonic()
+
+    def running_for(self):
+        return 0.0 if self._started_at is None else time.monotonic() - self._started_at
+
+    def cancel(self, reason="Cancelled"):
+        """Ask the job to stop; a job that never started finishes straight away"""
+        with self._lock:
+            if self._cancel_reason is None:
+                self._cancel_reason = reason
+        if self._started_at is None and not self.done():
+            self.exception = JobCancelledError(reason)
+            self._done.set()
+
+    def _check_cancelled(self):
+        if self._cancel_reason is not None:
+            raise JobCancelledError(self._cancel_reason)
+
+    def status(self, text):
+        self._check_cancelled()
+        with self._lock:
+            self._status = text
+
+    def progress(self, percent):
+        self._check_cancelled()
+        with self._lock:
+            self._percent = percent
+
+    def error(self, text):
+        logger.warning(text)
+        with self._lock:
+            self._errors.append(text)
+
+    def clear(self):
+        with self._lock:
+            self._status = ""
+
+    def course_done(self, course_name, assignments):
+        with self._lock:
+            first = not self._courses
+            # A course sent again (a Selenium retry after a failed HTTP scrape) replaces its first copy
+            self._courses[course_name] = list(assignments)
+        if first:
+            metrics.observe("time_to_first_course", time.monotonic() - self._started_at)
+        self._check_cancelled()
+
+    def snapshot(self):
+        """{"status", "percent", "errors", "courses", "done", "position", "eta_s"}, copied under the lock"""
+        position, eta = (0, 0.0)
+        if self._scheduler is not None:
+            position, eta = self._scheduler.queue_position(self)
+        with self._lock:
+            return {
+                "status": self._status,
+                "percent": self._percent,
+                "errors": list(self._errors),
+                "courses": list(self._courses.items()),
+                "done": self.done(),
+                "position": position,
+                "eta_s": eta,
+            }
+
+class JobScheduler:
+    """
+    FIFO admission control for ScrapeJobs, so a burst of logins cannot launch
+    more browsers (or portal sessions) than the container can hold.
+
+    At most max_concurrent jobs run at once; the rest wait in submission
+    order and can ask for their queue position and an estimated wait, based
+    on recent job durations. A maintenance thread cancels jobs that waited
+    longer than queue_timeout, ran longer than run_timeout, or whose UI
+    stopped calling touch() for abandon_timeout seconds.
+    """
+
+    def __init__(self, max_concurrent=3, queue_timeout=300, run_timeout=600,
+                 abandon_timeout=30, check_interval=2):
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue_timeout = queue_timeout
+        self.run_timeout = run_timeout
+        self.abandon_timeout = abandon_timeout
+        self.check_interval = check_interval
+        self._queue = deque()     # waiting jobs, oldest first
+        self._running = set()
+        self._durations = deque(maxlen=50)
+        self._closed = False
+        self._cond = threading.Condition()
+        self._maintainer = threading.Thread(target=self._maintain, daemon=True)
+        self._maintainer.start()
+
+    def submit(self, job):
+        """Queue a job that has not been started; it starts as soon as a slot frees up"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job scheduler is closed")
+            job._scheduler = self
+            self._queue.append(job)
+            self._dispatch()
+        return job
+
+    def cancel(self, job, reason="Cancelled"):
+        with self._cond:
+            queued = job in self._queue
+            if queued:
+                self._queue.remove(job)
+                self._publish()
+        if queued or job in self._running:
+            metrics.inc("jobs_cancelled_total", reason=reason)
+        job.cancel(reason)
+
+    def queue_position(self, job):
+        """(1-based position, estimated seconds until it starts), or (0, 0.0) once it is running"""
+        with self._cond:
+            try:
+                index = self._queue.index(job)
+            except ValueError:
+                return 0, 0.0
+            average = sum(self._durations) / len(self._durations) if self._durations else 10.0
+            # Jobs ahead of this one start in waves of max_concurrent
+            return index + 1, average * (index // self.max_concurrent + 1)
+
+    def stats(self):
+        with self._cond:
+            return {"queued": len(self._queue), "running": len(self._running),
+                    "max_concurrent": self.max_concurrent}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            jobs = list(self._queue) + list(self._running)
+            self._queue.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            job.cancel("Shutting down")
+
+    def _publish(self):
+        metrics.set_gauge("scheduler_queue_depth", len(self._queue))
+        metrics.set_gauge("scheduler_running_jobs", len(self._running))
+
+    def _dispatch(self):
+        # Called with the lock held
+        while self._queue and len(self._running) < self.max_concurrent:
+            job = self._queue.popleft()
+            if job.done():
+                continue  # Cancelled while queued
+            metrics.observe("queue_wait", time.monotonic() - job.created_at)
+            self._running.add(job)
+            job.start()
+        self._publish()
+
+    def _finished(self, job, seconds):
+        with self._cond:
+            if job in self._running:
+                self._running.discard(job)
+                if job.exception is None:
+                    self._durations.append(seconds)
+            self._dispatch()
+
+    def _maintain(self):
+        while not self._closed:
+            try:
+                self._expire()
+            except Exception:
+                logger.exception("Job scheduler maintenance failed")
+            with self._cond:
+                self._cond.wait(self.check_interval)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._cond:
+            queued, running = list(self._queue), list(self._running)
+        for job in queued:
+            if now - job.last_seen > self.abandon_timeout:
+                self.cancel(job, "Abandoned")
+            elif now - job.created_at > self.queue_timeout:
+                self.cancel(job, "Timed out waiting for a free slot")
+        for job in running:
+            if now - job.last_seen > self.abandon_timeout:
+                self.cancel(job, "Abandoned")
+            elif job.running_for() > self.run_timeout:
+                self.cancel(job, "Timed out")
+
+_shared_instances = {}
+_shared_lock = threading.Lock()
+
+def _shared(name, factory):
+    """Create factory() once per process and return the same object on every later call"""
+    with _shared_lock:
+        if name not in _shared_instances:
+            _shared_instances[name] = factory()
+        return _shared_instances[name]
+
+# Lean scraping profile: the scrapers only read the DOM, so images, media,
+# fonts, stylesheets and third-party analytics are never fetched
+lean_browser = os.environ.get("BUKC_LEAN_BROWSER", "1") != "0"
+blocked_url_patterns = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.mp4", "*.webm", "*.mp3",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.css",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*",
+] + [p.strip() for p in os.environ.get("BUKC_BLOCKED_URLS", "").split(",") if p.strip()]
+# Chromium instances must not share a disk cache, so each live browser leases a slot directory
+browser_cache_dir = os.environ.get("BUKC_BROWSER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bukc-browser-cache"))
+browser_cache_slots = int(os.environ.get("BUKC_BROWSER_CACHE_SLOTS", "8"))
+_leased_cache_slots = set()
+_cache_slot_lock = threading.Lock()
+
+def _lease_cache_slot():
+    with _cache_slot_lock:
+        for slot in range(browser_cache_slots):
+            if slot not in _leased_cache_slots:
+                _leased_cache_slots.add(slot)
+                return slot
+    return None
+
+def _release_cache_slot(slot):
+    with _cache_slot_lock:
+        _leased_cache_slots.discard(slot)
+
+@metrics.timed("create_webdriver")
+def create_webdriver(lean=None):
+    """Launch headless Chrome; lean (default BUKC_LEAN_BROWSER) applies the resource-blocking profile"""
+    lean = lean_browser if lean is None else lean
+    # Configure Chrome options
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-infobars")
+    
+    cache_slot = None
+    if lean:
+        # Hand control back once the DOM is parsed; every step waits for its own elements anyway
+        chrome_options.page_load_strategy = "eager"
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+            "profile.managed_default_content_settings.notifications": 2,
+        })
+        cache_slot = _lease_cache_slot()
+        if cache_slot is not None:
+            # Scripts that are still fetched come from a disk cache that outlives the browser
+            chrome_options.add_argument(f"--disk-cache-dir={os.path.join(browser_cache_dir, f'slot-{cache_slot}')}")
+            chrome_options.add_argument("--disk-cache-size=67108864")
+    
+    # Setup the webdriver
+    try:
+        driver = webdriver.Chrome(options=chrome_options)
+        if lean:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_url_patterns})
+    except Exception:
+        if cache_slot is not None:
+            _release_cache_slot(cache_slot)
+        raise
+    driver.bukc_cache_slot = cache_slot
+    return driver
+
+def quit_webdriver(driver):
+    """Quit a browser from create_webdriver and free its disk cache slot"""
+    try:
+        driver.quit()
+    finally:
+        slot = getattr(driver, "bukc_cache_slot", None)
+        if slot is not None:
+            _release_cache_slot(slot)
+
+class WebDriverPool:
+    """
+    Process-wide pool of warm headless browsers shared by every Streamlit session.
+
+    Drivers are checked out for a login and checked back in on logout; checkin
+    wipes cookies and storage so the next user starts clean. A maintenance
+    thread keeps min_idle browsers launched, quits browsers idle for longer
+    than idle_timeout, reclaims leases older than lease_timeout (sessions that
+    were abandoned without logging out) and recycles crashed browsers.
+    """
+
+    def __init__(self, max_size=3, min_idle=1, idle_timeout=600, lease_timeout=1800,
+                 check_interval=30, factory=create_webdriver):
+        self.max_size = max_size
+        self.min_idle = min(min_idle, max_size)
+        self.idle_timeout = idle_timeout
+        self.lease_timeout = lease_timeout
+        self.check_interval = check_interval
+        self.factory = factory
+        self._idle = []      # [(driver, idle_since)], most recently used last
+        self._leased = {}    # id(driver) -> (driver, leased_at)
+        self._launching = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._maintainer = threading.Thread(target=self._maintain, daemon=True)
+        self._maintainer.start()
+
+    def _total(self):
+        return len(self._idle) + len(self._leased) + self._launching
+
+    def stats(self):
+        with self._cond:
+            return {"idle": len(self._idle), "leased": len(self._leased),
+                    "launching": self._launching, "max_size": self.max_size}
+
+    def checkout(self, timeout=60):
+        """Lease a healthy driver, launching one if under max_size. Raises TimeoutError when none frees up"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                driver = None
+                while driver is None:
+                    if self._closed:
+                        raise RuntimeError("WebDriver pool is closed")
+                    if self._idle:
+                        driver, _ = self._idle.pop()
+                        self._leased[id(driver)] = (driver, time.monotonic())
+                    elif self._total() < self.max_size:
+                        self._launching += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("No browser became available")
+                        self._cond.wait(remaining)
+
+            if driver is None:
+                try:
+                    driver = self.factory()
+                finally:
+                    with self._cond:
+                        self._launching -= 1
+                        if driver is not None:
+                            self._leased[id(driver)] = (driver, time.monotonic())
+                        self._cond.notify_all()
+                return driver
+
+            if self.is_healthy(driver):
+                return driver
+            self._discard(driver)
+
+    def checkin(self, driver):
+        """Return a leased driver; it is wiped for the next user, or quit if that fails"""
+        release_http_session(driver)
+        with self._cond:
+            if self._leased.pop(id(driver), None) is None:
+                return  # Already reclaimed by the maintenance thread
+        if self._closed or not self._reset(driver):
+            self._quit(driver)
+        else:
+            with self._cond:
+                self._idle.append((driver, time.monotonic()))
+        with self._cond:
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            drivers = [d for d, _ in self._idle] + [d for d, _ in self._leased.values()]
+            self._idle = []
+            self._leased = {}
+            self._cond.notify_all()
+        for driver in drivers:
+            self._quit(driver)
+
+    def discard(self, driver):
+        """Quit a leased driver that broke instead of returning it; a later checkout launches a replacement"""
+        self._discard(driver)
+
+    @staticmethod
+    def is_healthy(driver):
+        """True when the browser still answers a script and has a window, i.e. it can be checked back in"""
+        try:
+            return driver.execute_script("return 1") == 1 and bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        with self._cond:
+            self._leased.pop(id(driver), None)
+            self._cond.notify_all()
+        self._quit(driver)
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            quit_webdriver(driver)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _reset(driver):
+        """Clear cookies and site storage left behind by the previous user"""
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in {cms_base, lms_base}:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            driver.get("about:blank")
+            driver.delete_all_cookies()
+            return True
+        except Exception:
+            return False
+
+    def _maintain(self):
+        while not self._closed:
+            try:
+                self._evict_and_check()
+                self._warm_up()
+            except Exception:
+                logger.exception("WebDriver pool maintenance failed")
+            with self._cond:
+                self._cond.wait(self.check_interval)
+
+    def _evict_and_check(self):
+        now = time.monotonic()
+        with self._cond:
+            # Reclaim leases from sessions that never logged out
+            expired = [d for d, leased_at in self._leased.values() if now - leased_at > self.lease_timeout]
+            for driver in expired:
+                del self._leased[id(driver)]
+            # Quit the longest-idle browsers beyond the warm minimum
+            keep, stale = [], []
+            for driver, idle_since in reversed(self._idle):
+                if len(keep) >= self.min_idle and now - idle_since > self.idle_timeout:
+                    stale.append(driver)
+                else:
+                    keep.append((driver, idle_since))
+            # Lease the rest briefly so no session picks them up mid health check
+            checking = list(reversed(keep))
+            self._idle = []
+            for driver, _ in checking:
+                self._leased[id(driver)] = (driver, now)
+            self._cond.notify_all()
+
+        for driver in expired + stale:
+            self._quit(driver)
+        for driver, idle_since in checking:
+            with self._cond:
+                self._leased.pop(id(driver), None)
+            if self.is_healthy(driver):
+                with self._cond:
+                    self._idle.append((driver, idle_since))
+            else:
+                self._quit(driver)  # Crashed browser; _warm_up launches a replacement
+        with self._cond:
+            self._cond.notify_all()
+
+    def _warm_up(self):
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._launching >= self.min_idle or self._total() >= self.max_size:
+                    return
+                self._launching += 1
+            driver = None
+            try:
+                driver = self.factory()
+            finally:
+                with self._cond:
+                    self._launching -= 1
+                    if driver is not None:
+                        self._idle.append((driver, time.monotonic()))
+                    self._cond.notify_all()
+
+def get_driver_pool():
+    """The shared WebDriver pool, sized through BUKC_DRIVER_POOL_* environment variables"""
+    return _shared("driver_pool", lambda: WebDriverPool(
+        max_size=int(os.environ.get("BUKC_DRIVER_POOL_SIZE", "3")),
+        min_idle=int(os.environ.get("BUKC_DRIVER_POOL_WARM", "1")),
+        idle_timeout=float(os.environ.get("BUKC_DRIVER_POOL_IDLE_TIMEOUT", "600")),
+        lease_timeout=float(os.environ.get("BUKC_DRIVER_POOL_LEASE_TIMEOUT", "1800")),
+    ))
+
+def get_job_scheduler():
+    """The shared job scheduler; BUKC_MAX_CONCURRENT_JOBS defaults to the browser pool size"""
+    return _shared("job_scheduler", lambda: JobScheduler(
+        max_concurrent=int(os.environ.get("BUKC_MAX_CONCURRENT_JOBS", os.environ.get("BUKC_DRIVER_POOL_SIZE", "3"))),
+        queue_timeout=float(os.environ.get("BUKC_QUEUE_TIMEOUT", "300")),
+        run_timeout=float(os.environ.get("BUKC_JOB_TIMEOUT", "600")),
+        abandon_timeout=float(os.environ.get("BUKC_JOB_ABANDON_TIMEOUT", "30")),
+    ))
+
+def shutdown():
+    """Cancel scheduled jobs and quit any pooled browsers; for scripts that exit once they are done"""
+    with _shared_lock:
+        scheduler = _shared_instances.get("job_scheduler")
+        pool = _shared_instances.get("driver_pool")
+    if scheduler is not None:
+        scheduler.close()
+    if pool is not None:
+        pool.close()
+
+# CMS/LMS URLs (override the hosts to point at mock_cms.py for offline runs)
+cms_base = os.environ.get("BUKC_CMS_BASE", "https://cms.bahria.edu.pk").rstrip("/")
+lms_base = os.environ.get("BUKC_LMS_BASE", "https://lms.bahria.edu.pk").rstrip("/")
+cms_url = f"{cms_base}/Logins/Student/Login.aspx"
+go_to_lms_url = f"{cms_base}/Sys/Common/GoToLMS.aspx"
+lms_url = f"{lms_base}/Student/Assignments.php"
+
+campus_name = "Karachi Campus"
+role_name = "Student"
+# Course views are fetched concurrently over the authenticated cookies instead of
+# driving the courseName dropdown; set BUKC_PARALLEL_COURSES=0 to use the dropdown
+parallel_courses = os.environ.get("BUKC_PARALLEL_COURSES", "1") != "0"
+course_workers = int(os.environ.get("BUKC_COURSE_WORKERS", "6"))
+
+user_agent = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+class LoginPageError(Exception):
+    """Raised when the CMS login page does not look the way the HTTP engine expects"""
+
+# Per-stage timeouts (seconds) for the browser readiness waits
+stage_timeouts = {
+    "login_page": 10,
+    "login_submit": 15,
+    "lms_redirect": 15,
+    "course_list": 10,
+    "course_view": 10,
+}
+def wait_until(driver, stage, condition):
+    """
+    Wait for condition using the timeout configured for stage, recording how
+    long the wait actually took as a wait.<stage> span. Raises TimeoutException
+    like WebDriverWait.
+    """
+    with metrics.span(f"wait.{stage}"):
+        return WebDriverWait(driver, stage_timeouts[stage], poll_frequency=0.1).until(condition)
+
+def page_replaced(old_page, old_table=None):
+    """Condition: the page (or just the assignments table) was swapped out and has finished loading"""
+    def condition(driver):
+        if old_table is not None:
+            replaced = EC.staleness_of(old_table)(driver)
+        else:
+            replaced = EC.staleness_of(old_page)(driver) or bool(driver.find_elements(By.TAG_NAME, "table"))
+        return replaced and driver.execute_script("return document.readyState") == "complete"
+    return condition
+
+def reached_lms(driver):
+    """Condition: the GoToLMS hand-off landed on the LMS and its cookies are set"""
+    current = driver.current_url.lower()
+    return current.startswith(lms_base.lower()) and "gotolms" not in current and bool(driver.get_cookies())
+
+# Step 1: Login to CMS
+@metrics.timed("login_to_cms")
+def login_to_cms(wait, driver, username, password):
+    driver.get(cms_url)
+    
+    # Wait for the enrollment field to be visible before interacting with it
+    enrollment_field = wait_until(driver, "login_page", EC.visibility_of_element_located((By.ID, "BodyPH_tbEnrollment")))
+    enrollment_field.send_keys(username)
+
+    # Wait for the password field to be visible
+    password_field = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_tbPassword")))
+    password_field.send_keys(password)
+
+    # For Campus selection
+    institute_dropdown = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_ddlInstituteID")))
+    select_institute = Select(institute_dropdown)
+    select_institute.select_by_visible_text(campus_name)
+
+    # For Role selection (if not default)
+    role_dropdown = wait.until(EC.visibility_of_element_located((By.ID, "BodyPH_ddlSubUserType")))
+    select_role = Select(role_dropdown)
+    select_role.select_by_visible_text(role_name)
+
+    login_button = driver.find_element(By.ID, "BodyPH_btnLogin")
+    login_button.click()
+
+    # The postback replaces the page whether or not the credentials were accepted
+    wait_until(driver, "login_submit", EC.staleness_of(login_button))
+    return "login.aspx" not in urllib.parse.urlparse(driver.current_url).path.lower()
+
+# Step 2: Navigate to LMS and open Assignments
+@metrics.timed("navigate_to_lms")
+def navigate_to_lms(driver):
+    driver.get(go_to_lms_url)
+    wait_until(driver, "lms_redirect", reached_lms)
+
+# Browserless login: the same steps as above over a plain requests.Session
+def create_http_session():
+    """
+    A keep-alive session with a connection pool large enough for the course and
+    download workers. Idempotent requests are retried with exponential backoff on
+    connection errors, timeouts and 5xx responses; the login POST never is.
+    """
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=3,
+        status=3,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, course_workers, download_workers), max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": user_agent})
+    return session
+
+def _select_value(soup, element_id, visible_text):
+    """Return the option value whose label matches visible_text in the <select> with element_id"""
+    select = soup.find("select", id=element_id)
+    if select is None:
+        raise LoginPageError(f"Missing dropdown {element_id}")
+    for option in select.find_all("option"):
+        if option.text.strip() == visible_text:
+            return select["name"], option.get("value", option.text.strip())
+    raise LoginPageError(f"Option '{visible_text}' not found in {element_id}")
+
+def _field_name(soup, element_id):
+    field = soup.find(id=element_id)
+    if field is None or not field.get("name"):
+        raise LoginPageError(f"Missing field {element_id}")
+    return field["name"]
+
+def build_login_payload(login_html, username, password):
+    """Build the ASP.NET postback for Login.aspx, returning (action, payload)"""
+    soup = BeautifulSoup(login_html, 'html.parser')
+    form = soup.find("form")
+    if form is None:
+        raise LoginPageError("Login form not found")
+
+    # Carry over every hidden field (__VIEWSTATE, __VIEWSTATEGENERATOR, __EVENTVALIDATION, ...)
+    payload = {
+        field["name"]: field.get("value", "")
+        for field in form.find_all("input", type="hidden")
+        if field.get("name")
+    }
+    for required in ("__VIEWSTATE", "__EVENTVALIDATION"):
+        if required not in payload:
+            raise LoginPageError(f"Missing {required}")
+
+    payload[_field_name(soup, "BodyPH_tbEnrollment")] = username
+    payload[_field_name(soup, "BodyPH_tbPassword")] = password
+    name, value = _select_value(soup, "BodyPH_ddlInstituteID", campus_name)
+    payload[name] = value
+    name, value = _select_value(soup, "BodyPH_ddlSubUserType", role_name)
+    payload[name] = value
+
+    button = soup.find(id="BodyPH_btnLogin")
+    if button is None or not button.get("name"):
+        raise LoginPageError("Missing login button")
+    payload[button["name"]] = button.get("value", "")
+
+    return form.get("action") or cms_url, payload
+
+@metrics.timed("login_to_cms")
+def http_login_to_cms(session, username, password):
+    """Log in to the CMS without a browser. Returns True if the postback left Login.aspx"""
+    response = session.get(cms_url, timeout=10)
+    response.raise_for_status()
+    action, payload = build_login_payload(response.text, username, password)
+
+    response = session.post(urllib.parse.urljoin(response.url, action), data=payload, allow_redirects=True, timeout=10)
+    response.raise_for_status()
+    return "login.aspx" not in urllib.parse.urlparse(response.url).path.lower()
+
+def on_lms_page(url):
+    """
+    True for a page served by the LMS. The CMS pages are all ASP.NET (.aspx),
+    which keeps the two apart when both portals share a host, as in mock_cms.
+    """
+    return url.lower().startswith(lms_base.lower()) and not urllib.parse.urlparse(url).path.lower().endswith(".aspx")
+
+def has_course_dropdown(page_html):
+    """True when the page has the LMS courseName dropdown, however its name attribute is quoted"""
+    return re.search(r"""name=["']?courseName\b""", page_html) is not None
+
+def require_course_dropdown(page_html, url):
+    """Raise LoginPageError unless the page has the LMS courseName dropdown"""
+    if not has_course_dropdown(page_html):
+        raise LoginPageError(f"No course dropdown on {url}; the LMS session is missing or the layout changed")
+
+@metrics.timed("navigate_to_lms")
+def http_navigate_to_lms(session):
+    """Follow GoToLMS.aspx so the session picks up the LMS cookies. Returns True once the LMS is reached"""
+    response = session.get(go_to_lms_url, allow_redirects=True, timeout=10)
+    response.raise_for_status()
+
+    # The hand-off may be an auto-submitting form instead of a plain redirect. Only a form still on
+    # the CMS is submitted, never a search or logout form on an LMS page
+    form = None
+    if response.url.lower().startswith(cms_base.lower()) and not on_lms_page(response.url):
+        form = BeautifulSoup(response.text, 'html.parser').find("form")
+    if form is not None and form.get("action") and not form.find("input", type="password"):
+        fields = {field["name"]: field.get("value", "") for field in form.find_all("input") if field.get("name")}
+        target = urllib.parse.urljoin(response.url, form["action"])
+        if (form.get("method") or "get").lower() == "post":
+            response = session.post(target, data=fields, allow_redirects=True, timeout=10)
+        else:
+            response = session.get(target, params=fields, allow_redirects=True, timeout=10)
+        response.raise_for_status()
+
+    return on_lms_page(response.url)
+
+def get_http_session(client):
+    """
+    Return a requests.Session for either a logged-in HTTP session or a Selenium
+    driver. A driver keeps one long-lived session for as long as it is leased,
+    and its cookies are only copied over again when they have changed.
+    """
+    if isinstance(client, requests.Session):
+        return client
+
+    session = getattr(client, "bukc_http_session", None)
+    if session is None:
+        session = create_http_session()
+        client.bukc_http_session = session
+        client.bukc_cookie_snapshot = None
+
+    cookies = client.get_cookies()
+    snapshot = sorted((c['name'], c['value'], c.get('domain', ''), c.get('path', '/')) for c in cookies)
+    if snapshot != client.bukc_cookie_snapshot:
+        session.cookies.clear()
+        for cookie in cookies:
+            session.cookies.set(cookie['name'], cookie['value'],
+                                domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        client.bukc_cookie_snapshot = snapshot
+    return session
+
+def release_http_session(driver):
+    """Close and forget the session tied to a driver before someone else uses it"""
+    session = getattr(driver, "bukc_http_session", None)
+    if session is not None:
+        session.close()
+        driver.bukc_http_session = None
+        driver.bukc_cookie_snapshot = None
+
+class SessionVault:
+    """
+    Short-lived, in-memory store of authenticated CMS/LMS cookies so a
+    returning user skips the login postbacks.
+
+    Entries are looked up by an HMAC of the credentials under a per-process
+    secret and encrypted with AES-GCM under a second key derived the same
+    way, so cookies can only be read back by someone presenting the same
+    username and password, and nothing usable is kept at rest. An entry is
+    dropped when its ttl runs out, when it fails to decrypt, when the caller
+    reports that the portal no longer accepts it, or on logout.
+    """
+
+    def __init__(self, ttl=600, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()  # entry id -> (nonce, ciphertext, expires_at)
+        self._lock = threading.Lock()
+
+    def _derive(self, username, password):
+        digest = hmac.new(self._secret, f"{username}\0{password}".encode(), hashlib.sha512).digest()
+        return digest[:32].hex(), digest[32:]
+
+    def entry_id(self, username, password):
+        """The lookup id for these credentials; enough to invalidate, not to decrypt"""
+        return self._derive(username, password)[0]
+
+    def put(self, username, password, cookies):
+        entry_id, key = self._derive(username, password)
+        nonce = secrets.token_bytes(12)
+        ciphertext = AESGCM(key).encrypt(nonce, json.dumps(cookies).encode(), entry_id.encode())
+        now = time.monotonic()
+        with self._lock:
+            self._drop_expired(now)
+            self._entries[entry_id] = (nonce, ciphertext, now + self.ttl)
+            self._entries.move_to_end(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, username, password):
+        """The stored cookies for these credentials, or None when missing or expired"""
+        entry_id, key = self._derive(username, password)
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return None
+            if time.monotonic() > entry[2]:
+                del self._entries[entry_id]
+                metrics.inc("session_vault_total", result="expired")
+                return None
+        try:
+            return json.loads(AESGCM(key).decrypt(entry[0], entry[1], entry_id.encode()))
+        except (InvalidTag, ValueError):
+            self.invalidate(entry_id)
+            return None
+
+    def invalidate(self, entry_id):
+        with self._lock:
+            self._entries.pop(entry_id, None)
+
+    def _drop_expired(self, now):
+        # Every put moves its entry to the end with the same ttl, so the expired entries are the oldest ones
+        while self._entries:
+            entry_id, (_, _, expires_at) = next(iter(self._entries.items()))
+            if now <= expires_at:
+                break
+            del self._entries[entry_id]
+
+    def purge(self):
+        """Drop every expired entry; also done on each put, and by the app on every page run"""
+        with self._lock:
+            self._drop_expired(time.monotonic())
+
+def get_session_vault():
+    """The shared session vault, or None when disabled (BUKC_SESSION_VAULT=0) or cryptography is missing"""
+    if AESGCM is None or os.environ.get("BUKC_SESSION_VAULT", "1") == "0":
+        return None
+    return _shared("session_vault", lambda: SessionVault(
+        ttl=float(os.environ.get("BUKC_SESSION_TTL", "600")),
+    ))
+
+def session_cookies(client):
+    """Every CMS and LMS cookie of an HTTP session or a driver, as plain dicts"""
+    if isinstance(client, requests.Session):
+        return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": c.secure}
+                for c in client.cookies]
+    # get_cookies() only covers the current page's domain; CDP returns both portals' cookies
+    cookies = client.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    return [{"name": c["name"], "value": c["value"], "domain": c["domain"], "path": c["path"], "secure": c["secure"]}
+            for c in cookies]
+
+def http_session_from_cookies(cookies):
+    session = create_http_session()
+    for cookie in cookies:
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                            secure=cookie["secure"])
+    return session
+
+def restore_browser_cookies(driver, cookies):
+    """Load stored cookies into a browser without visiting either portal first"""
+    for cookie in cookies:
+        driver.execute_cdp_cmd("Network.setCookie", {
+            "name": cookie["name"], "value": cookie["value"], "domain": cookie["domain"],
+            "path": cookie["path"], "secure": cookie["secure"],
+        })
+
+def probe_lms_session(session):
+    """
+    One GET of Assignments.php without following redirects: the cookies are
+    still good when the course dropdown comes back instead of a login redirect
+    """
+    with metrics.span("session_probe"):
+        try:
+            response = session.get(lms_url, allow_redirects=False, timeout=5)
+        except requests.RequestException:
+            return False
+        return response.status_code == 200 and has_course_dropdown(response.text)
+
+def reuse_http_session(vault, username, password):
+    """A logged-in HTTP session rebuilt from the vault, or None (stale entries are invalidated)"""
+    cookies = vault.get(username, password) if vault is not None else None
+    if not cookies:
+        return None
+    session = http_session_from_cookies(cookies)
+    if probe_lms_session(session):
+        metrics.inc("session_vault_total", result="reused")
+        return session
+    session.close()
+    vault.invalidate(vault.entry_id(username, password))
+    metrics.inc("session_vault_total", result="rejected")
+    return None
+
+def authenticate_browser(wait, driver, username, password, vault=None):
+    """
+    Get a browser onto the LMS: from vault cookies when the portal still
+    accepts them, else through the login form (storing the new cookies).
+    Returns False when the credentials were rejected.
+    """
+    probe_session = reuse_http_session(vault, username, password)
+    if probe_session is not None:
+        probe_session.close()
+        restore_browser_cookies(driver, vault.get(username, password) or [])
+        driver.get(lms_url)
+        try:
+            wait_until(driver, "lms_redirect", reached_lms)
+            return True
+        except TimeoutException:
+            vault.invalidate(vault.entry_id(username, password))
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+
+    if not login_to_cms(wait, driver, username, password):
+        return False
+    navigate_to_lms(driver)
+    if vault is not None:
+        vault.put(username, password, session_cookies(driver))
+    return True
+
+# Downloads are streamed in fixed-size chunks into spooled temp files that move
+# to disk past spool_threshold; anything above max_download_bytes is refused
+download_chunk_size = 64 * 1024
+spool_threshold = 1024 * 1024
+max_download_bytes = int(os.environ.get("BUKC_MAX_DOWNLOAD_MB", "100")) * 1024 * 1024
+# HTML responses are read into memory to look for the file link only up to this size
+max_landing_page_bytes = int(os.environ.get("BUKC_MAX_LANDING_PAGE_MB", "2")) * 1024 * 1024
+
+# A stalled read can be resumed; the whole download must finish within download_deadline(size)
+download_stall_timeout = float(os.environ.get("BUKC_DOWNLOAD_STALL_TIMEOUT", "30"))
+min_download_rate = int(os.environ.get("BUKC_MIN_DOWNLOAD_KBPS", "32")) * 1024
+download_resumes = int(os.environ.get("BUKC_DOWNLOAD_RESUMES", "3"))
+download_timeout = (10, download_stall_timeout)
+
+class DownloadTooLargeError(Exception):
+    """Raised when a download is bigger than max_download_bytes"""
+
+class DownloadBudgetError(Exception):
+    """Raised when the process-wide download budget stays full for too long"""
+
+class DownloadTimeoutError(Exception):
+    """Raised when a download runs past the deadline allowed for its size"""
+
+def download_deadline(size):
+    """Seconds a download of size bytes may take: the stall allowance plus size at min_download_rate"""
+    return download_stall_timeout + size / min_download_rate
+
+class DownloadBudget:
+    """
+    Caps the bytes all in-flight downloads of the process may hold at once.
+    Downloads reserve their declared size up front (or grow their
+    reservation chunk by chunk when it is unknown) and release it when they
+    finish; a download that cannot get its share within wait_timeout fails.
+    """
+
+    def __init__(self, max_bytes, wait_timeout=30):
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes):
+        if nbytes > self.max_bytes:
+            raise DownloadBudgetError(f"A {nbytes // (1024 * 1024)} MB download does not fit the "
+                                      f"{self.max_bytes // (1024 * 1024)} MB download budget")
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_use + nbytes <= self.max_bytes, self.wait_timeout):
+                metrics.inc("download_budget_rejections_total")
+                raise DownloadBudgetError("Too many large downloads in progress, try again shortly")
+            self.in_use += nbytes
+            metrics.set_gauge("download_budget_bytes_in_use", self.in_use)
+
+    def release(self, nbytes):
+        if not nbytes:
+            return
+        with self._cond:
+            self.in_use -= nbytes
+            metrics.set_gauge("download_budget_bytes_in_use", self.in_use)
+            self._cond.notify_all()
+
+def get_download_budget():
+    return _shared("download_budget", lambda: DownloadBudget(
+        int(os.environ.get("BUKC_DOWNLOAD_BUDGET_MB", "1024")) * 1024 * 1024,
+    ))
+
+def content_length(response):
+    declared = response.headers.get("Content-Length", "")
+    return int(declared) if declared.isdigit() else None
+
+def stream_to_spooled_file(response, max_bytes=None, session=None, on_progress=None, budget=None, head=b""):
+    """
+    Copy a stream=True response body into a SpooledTemporaryFile chunk by chunk,
+    so at most spool_threshold bytes of it are ever held in memory.
+    Returns (file positioned at 0, sha256 hexdigest). head is the start of the
+    body when the caller has already read some of it.
+
+    The download counts against the process-wide DownloadBudget and must
+    finish within download_deadline() of its size. When the connection drops
+    or stalls and a session is given, it is resumed with a Range request
+    (guarded by If-Range) up to download_resumes times. on_progress(received,
+    total) is called after every chunk; total is None when the size is unknown.
+    """
+    limit = max_bytes or max_download_bytes
+    budget = budget or get_download_budget()
+    total = content_length(response)
+    if total is not None and total > limit:
+        response.close()
+        raise DownloadTooLargeError(f"File is {total // (1024 * 1024)} MB, the limit is {limit // (1024 * 1024)} MB")
+
+    url = response.url
+    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+    deadline = time.monotonic() + download_deadline(total if total is not None else limit)
+    digest = hashlib.sha256()
+    size = 0
+    reserved = 0
+    resumes = 0
+    spooled = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+    chunks = itertools.chain([head] if head else [], response.iter_content(chunk_size=download_chunk_size))
+    try:
+        if total:
+            budget.acquire(total)
+            reserved = total
+        while True:
+            try:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > limit:
+                        raise DownloadTooLargeError(f"File is larger than the {limit // (1024 * 1024)} MB limit")
+                    if size > reserved:
+                        budget.acquire(size - reserved)
+                        reserved = size
+                    if time.monotonic() > deadline:
+                        raise DownloadTimeoutError(f"Download did not finish within {download_deadline(total or size):.0f} s")
+                    digest.update(chunk)
+                    spooled.write(chunk)
+                    metrics.inc("download_bytes_total", len(chunk))
+                    if on_progress is not None:
+                        on_progress(size, total)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                response.close()
+                if session is None or resumes >= download_resumes or time.monotonic() > deadline:
+                    raise
+                resumes += 1
+                metrics.inc("download_resumes_total")
+                headers = {"Range": f"bytes={size}-"}
+                if validator:
+                    headers["If-Range"] = validator
+                response = session.get(url, headers=headers, allow_redirects=True, timeout=download_timeout, stream=True)
+                chunks = response.iter_content(chunk_size=download_chunk_size)
+                if response.status_code == 206 and response.headers.get("Content-Range", "").startswith(f"bytes {size}-"):
+                    continue  # Append the rest
+                if response.status_code != 200:
+                    raise requests.HTTPError(f"HTTP {response.status_code} resuming download", response=response)
+                # The file changed or ranges are not supported: start over
+                spooled.seek(0)
+                spooled.truncate()
+                digest = hashlib.sha256()
+                size = 0
+                total = content_length(response)
+    except Exception:
+        spooled.close()
+        raise
+    finally:
+        response.close()
+        budget.release(reserved)
+    spooled.seek(0)
+    return spooled, digest.hexdigest()
+
+class DownloadCache:
+    """
+    On-disk cache for assignment files shared by every user.
+
+    Files are stored once per content hash under blobs/, and an index maps each
+    resolved file URL (plus the assignment URL that led to it) to its blob and
+    HTTP validators. Cached copies are always revalidated with
+    If-None-Match/If-Modified-Since using the requesting user's cookies, so a
+    file is only served to someone the LMS still lets download it. The least
+    recently used entries are evicted once the blobs exceed max_bytes.
+
+    Separately, it remembers which file URL each HTML landing page resolved
+    to (up to max_targets pages), so later downloads go straight to the file
+    even after its blob has been evicted.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, max_targets=10000):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(directory, "blobs")
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._entries = OrderedDict()  # resolved url -> {hash, filename, etag, last_modified, size}
+        self._aliases = {}             # requested url -> resolved url
+        self._targets = OrderedDict()  # landing page url -> file url, least recently used first
+        self.max_targets = max_targets
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._stored_bytes(),
+            }
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest)
+
+    def _stored_bytes(self):
+        return sum({e["hash"]: e["size"] for e in self._entries.values()}.values())
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        for url, entry in index.get("entries", []):
+            if os.path.exists(self._blob_path(entry["hash"])):
+                self._entries[url] = entry
+        self._aliases = {k: v for k, v in index.get("aliases", {}).items() if v in self._entries}
+        self._targets = OrderedDict(index.get("targets", []))
+
+    def _save_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"entries": list(self._entries.items()), "aliases": self._aliases,
+                       "targets": list(self._targets.items())}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def revalidate(self, session, url, on_progress=None):
+        """
+        Conditionally re-request a cached file. Returns (content, filename) on a
+        304 (or a fresh non-HTML 200, which replaces the cached copy), else None.
+        """
+        with self._lock:
+            resolved = self._aliases.get(url, url)
+            entry = self._entries.get(resolved)
+            if entry is None or not (entry.get("etag") or entry.get("last_modified")):
+                self.misses += 1
+                metrics.inc("download_cache_misses_total")
+                return None
+            entry = dict(entry)
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        response = session.get(resolved, headers=headers, allow_redirects=True, timeout=download_timeout, stream=True)
+
+        if response.status_code == 304:
+            response.close()
+            try:
+                blob = open(self._blob_path(entry["hash"]), "rb")
+            except OSError:
+                with self._lock:
+                    self.misses += 1
+                    metrics.inc("download_cache_misses_total")
+                return None
+            metrics.inc("download_cache_hits_total")
+            with self._lock:
+                self.hits += 1
+                if resolved in self._entries:
+                    self._entries.move_to_end(resolved)
+            return blob, entry["filename"]
+
+        with self._lock:
+            self.misses += 1
+            metrics.inc("download_cache_misses_total")
+        if response.status_code == 200 and 'text/html' not in response.headers.get('Content-Type', ''):
+            return self.store(url, response, session=session, on_progress=on_progress)
+        response.close()
+        return None
+
+    def target_for(self, landing_url):
+        """The file URL a landing page resolved to last time, or None"""
+        with self._lock:
+            target = self._targets.get(landing_url)
+            if target is not None:
+                self._targets.move_to_end(landing_url)
+            return target
+
+    def remember_target(self, landing_url, file_url):
+        with self._lock:
+            self._targets[landing_url] = file_url
+            self._targets.move_to_end(landing_url)
+            while len(self._targets) > self.max_targets:
+                self._targets.popitem(last=False)
+            self._save_index()
+
+    def forget_target(self, landing_url):
+        with self._lock:
+            if self._targets.pop(landing_url, None) is not None:
+                self._save_index()
+
+    def store(self, url, response, filename=None, session=None, on_progress=None, head=b""):
+        """
+        Stream a downloaded file into the cache under its resolved URL and return
+        (file, filename); with a session an interrupted download is resumed.
+        head is the start of the body when it has already been read.
+        """
+        filename = filename or get_filename_from_headers(response)
+        spooled, digest = stream_to_spooled_file(response, session=session, on_progress=on_progress, head=head)
+        size = spooled.seek(0, os.SEEK_END)
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            spooled.seek(0)
+            fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir)
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(spooled, f, download_chunk_size)
+            os.replace(tmp_path, blob_path)
+        spooled.seek(0)
+
+        with self._lock:
+            self._entries[response.url] = {
+                "hash": digest,
+                "filename": filename,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": size,
+            }
+            self._entries.move_to_end(response.url)
+            if url != response.url:
+                self._aliases[url] = response.url
+            self._evict()
+            self._save_index()
+        return spooled, filename
+
+    def _evict(self):
+        while len(self._entries) > 1 and self._stored_bytes() > self.max_bytes:
+            url, entry = self._entries.popitem(last=False)
+            self.evictions += 1
+            metrics.inc("download_cache_evictions_total")
+            self._aliases = {k: v for k, v in self._aliases.items() if v != url}
+            if not any(e["hash"] == entry["hash"] for e in self._entries.values()):
+                try:
+                    os.remove(self._blob_path(entry["hash"]))
+                except OSError:
+                    pass
+
+def get_download_cache():
+    return _shared("download_cache", lambda: DownloadCache(
+        os.environ.get("BUKC_DOWNLOAD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bukc-download-cache")),
+        max_bytes=int(os.environ.get("BUKC_DOWNLOAD_CACHE_MB", "512")) * 1024 * 1024,
+    ))
+
+probe_workers = int(os.environ.get("BUKC_PROBE_WORKERS", "4"))
+
+def is_file_response(response):
+    """True when a 200/206 response carries a file rather than another HTML page"""
+    if response.status_code not in (200, 206):
+        return False
+    disposition = response.headers.get("Content-Disposition", "").lower()
+    if "attachment" in disposition or "filename" in disposition:
+        return True
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    return bool(content_type) and content_type not in ("text/html", "application/xhtml+xml")
+
+def download_candidates(page_url, page_html):
+    """Frame sources, then likely download links, from a landing page, in page order without duplicates"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    candidates = [urllib.parse.urljoin(page_url, frame['src']) for frame in soup.find_all(['frame', 'iframe'], src=True)]
+    for link in soup.find_all('a', href=True):
+        href = link.get('href', '')
+        if (
+            re.search(r'\.(pdf|doc|docx|ppt|pptx|xls|xlsx|zip|rar|txt)$', href.lower()) or
+            'download' in href.lower() or
+            'attachment' in href.lower()
+        ):
+            candidates.append(urllib.parse.urljoin(page_url, href))
+    return list(dict.fromkeys(candidates))
+
+def probe_download_target(session, url, found):
+    """
+    Check whether url serves a file without downloading its body: a HEAD
+    request, or a one-byte ranged GET when the server does not answer HEAD.
+    Skipped once another probe has already found the file.
+    """
+    if found.is_set():
+        return False
+    response = session.head(url, allow_redirects=True, timeout=10)
+    response.close()
+    if response.status_code in (405, 501) or (response.status_code == 200 and "Content-Type" not in response.headers):
+        if found.is_set():
+            return False
+        response = session.get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True, timeout=10, stream=True)
+        response.close()
+    return is_file_response(response)
+
+@metrics.timed("resolve_download_target")
+def resolve_download_target(session, page_url, page_html, max_workers=None):
+    """
+    Probe a landing page's candidate links concurrently and return the first
+    URL that serves a file, or None. Probes still queued once a file is found
+    are cancelled.
+    """
+    candidates = download_candidates(page_url, page_html)
+    if not candidates:
+        return None
+
+    found = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers or probe_workers, len(candidates))))
+    try:
+        futures = {executor.submit(probe_download_target, session, url, found): url for url in candidates}
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    found.set()
+                    return futures[future]
+            except requests.RequestException:
+                continue
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def read_landing_page(response, limit=None):
+    """
+    Read an HTML response body up to limit bytes (max_landing_page_bytes).
+    Returns (body, True) when it fit, else (the bytes read so far, False) with
+    the rest of the body still unread.
+    """
+    limit = limit or max_landing_page_bytes
+    chunks, size = [], 0
+    for chunk in response.iter_content(chunk_size=download_chunk_size):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            return b"".join(chunks), False
+    response.close()
+    return b"".join(chunks), True
+
+# Improved file download function
+@metrics.timed("download_file_content")
+def open_download(client, url, cache=None, on_progress=None):
+    """
+    Resolve and stream an assignment file using requests, either over the HTTP
+    login session or with the cookies from the Selenium session.
+    Returns (binary file object, filename); the caller closes the file.
+    on_progress(received, total) follows the file body as it streams to disk.
+    """
+    session = get_http_session(client)
+    cache = cache or get_download_cache()
+    
+    # Serve a cached copy if the LMS confirms it has not changed
+    cached = cache.revalidate(session, url, on_progress)
+    if cached is not None:
+        return cached
+    
+    # Go straight to the file a landing page resolved to before
+    target = cache.target_for(url)
+    if target is not None:
+        response = session.get(target, allow_redirects=True, timeout=download_timeout, stream=True)
+        if is_file_response(response):
+            metrics.inc("download_target_cache_hits_total")
+            return cache.store(url, response, session=session, on_progress=on_progress)
+        response.close()
+        cache.forget_target(url)
+    
+    # Make a request to the file URL
+    response = session.get(url, allow_redirects=True, timeout=download_timeout, stream=True)
+    
+    # Check if the response was successful
+    if response.status_code != 200:
+        response.close()
+        raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+
+    # Try to determine if it's a binary file or HTML
+    content_type = response.headers.get('Content-Type', '')
+    if 'text/html' not in content_type:
+        # It's likely a binary file
+        return cache.store(url, response, session=session, on_progress=on_progress)
+
+    # It's an HTML page; read it up to max_landing_page_bytes, anything bigger is kept as a file
+    body, complete = read_landing_page(response)
+    if not complete:
+        return cache.store(url, response, session=session, on_progress=on_progress, head=body)
+
+    # Probe the frames and download links it points at
+    landing_html = body.decode(response.encoding or "utf-8", "replace")
+    file_url = resolve_download_target(session, response.url, landing_html)
+    if file_url is not None:
+        file_response = session.get(file_url, allow_redirects=True, timeout=download_timeout, stream=True)
+        if is_file_response(file_response):
+            cache.remember_target(url, file_url)
+            return cache.store(url, file_response, session=session, on_progress=on_progress)
+        file_response.close()
+    
+    # If no download links found, return the HTML content
+    return BytesIO(body), "assignment.html"
+
+download_workers = int(os.environ.get("BUKC_DOWNLOAD_WORKERS", "4"))
+
+def safe_path_part(name):
+    """Make a course or file name usable as a ZIP path component"""
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]+', '_', name).strip(' .') or "untitled"
+
+def build_assignments_zip(client, assignments, on_progress=None, max_workers=None):
+    """
+    Download every assignment that has a link on a bounded thread pool and
+    write each file into a ZIP (one folder per course) as soon as it arrives.
+    A failed file is recorded and skipped rather than aborting the export.
+
+    on_progress(done, total, assignment, error) is called from the calling
+    thread after each file. Returns (ZIP file positioned at 0, [(assignment, error)]).
+    """
+    # Resolve the HTTP session and cache once; worker threads must not touch the driver
+    session = get_http_session(client)
+    cache = get_download_cache()
+    pending = [a for a in assignments if a.get("Download Link")]
+    total = len(pending)
+    failures = []
+    used_names = set()
+
+    archive = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+    # Handouts are mostly PDF/Office files that are already compressed, so store them as-is
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zf:
+        if total:
+            workers = max(1, min(max_workers or download_workers, total))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(open_download, session, assignment["Download Link"], cache): assignment
+                    for assignment in pending
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    assignment = futures[future]
+                    error = None
+                    try:
+                        file_obj, filename = future.result()
+                        with file_obj:
+                            folder = safe_path_part(assignment.get("Course", "Assignments"))
+                            base, ext = os.path.splitext(safe_path_part(filename))
+                            arcname = f"{folder}/{base}{ext}"
+                            n = 1
+                            while arcname in used_names:
+                                n += 1
+                                arcname = f"{folder}/{base} ({n}){ext}"
+                            used_names.add(arcname)
+                            with zf.open(arcname, "w", force_zip64=True) as dest:
+                                shutil.copyfileobj(file_obj, dest, download_chunk_size)
+                    except Exception as e:
+                        error = e
+                        failures.append((assignment, e))
+                    if on_progress is not None:
+                        on_progress(done, total, assignment, error)
+
+    archive.seek(0)
+    return archive, failures
+
+def get_filename_from_headers(response):
+    """Extract filename from Content-Disposition header or URL"""
+    # Try to get filename from Content-Disposition header
+    content_disposition = response.headers.get('Content-Disposition')
+    if content_disposition:
+        matches = re.findall(r'filename="(.+?)"', content_disposition)
+        if matches:
+            return matches[0]
+        
+        matches = re.findall(r'filename=([^;]+)', content_disposition)
+        if matches:
+            return matches[0].strip()
+    
+    # Try to get filename from URL
+    url_path = urllib.parse.urlparse(response.url).path
+    filename = url_path.split('/')[-1]
+    
+    # Remove query parameters
+    if '?' in filename:
+        filename = filename.split('?')[0]
+    
+    # If no extension or looks like a PHP file, try to determine from content type
+    if '.' not in filename or filename.endswith('.php'):
+        content_type = response.headers.get('Content-Type', '')
+        if 'pdf' in content_type:
+            filename = f"assignment_{int(time.time())}.pdf"
+        elif 'word' in content_type or 'doc' in content_type:
+            filename = f"assignment_{int(time.time())}.docx"
+        elif 'powerpoint' in content_type or 'presentation' in content_type:
+            filename = f"assignment_{int(time.time())}.pptx"
+        elif 'excel' in content_type or 'spreadsheet' in content_type:
+            filename = f"assignment_{int(time.time())}.xlsx"
+        elif 'zip' in content_type:
+            filename = f"assignment_{int(time.time())}.zip"
+        elif 'text/html' in content_type:
+            filename = f"assignment_{int(time.time())}.html"
+        else:
+            filename = f"assignment_{int(time.time())}.pdf"  # Default to PDF
+    
+    return filename
+
+# Step 3: Extract assignments for a given course
+def extract_assignments(driver):
+    return parse_assignments(course_table_html(driver))
+
+def course_table_html(driver):
+    """Fetch only the assignments table's outerHTML in one script call instead of the whole page source"""
+    return driver.execute_script("var t = document.querySelector('table'); return t ? t.outerHTML : '';") or ""
+
+def assignment_record(assignment_name, status, deadline, download_link):
+    """Build one assignment dict from a table row's cell values, or None if it should be skipped"""
+    if status == "Deadline Exceeded":
+        return None
+    
+    if download_link:
+        # Make sure the link is absolute
+        if not download_link.startswith('http'):
+            # Create absolute URL
+            base_url = f"{lms_base}/Student/"
+            download_link = urllib.parse.urljoin(base_url, download_link)
+    else:
+        download_link = None
+
+    return {
+        "Assignment": assignment_name,
+        "Deadline": deadline,
+        "Download Link": download_link
+    }
+
+# Deadline formats seen on the LMS, most common first
+deadline_formats = (
+    "%d %B %Y - %I:%M %p",
+    "%d %B %Y - %H:%M",
+    "%d %b %Y - %I:%M %p",
+    "%d-%m-%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%d %B %Y",
+)
+# A deadline without a time means the end of that day
+date_only_formats = {"%d %B %Y"}
+# The LMS prints deadlines in local campus time without a UTC offset
+portal_timezone = os.environ.get("BUKC_TIMEZONE", "Asia/Karachi")
+
+class DeadlineIndex:
+    """
+    Assignment deadlines parsed once per scrape, kept sorted for range queries.
+
+    Deadline strings are parsed column-wise with pandas, one format at a time
+    over the rows still unparsed, and localised to portal_timezone. Queries
+    return positions into the assignments list the index was built from, in
+    deadline order, so a UI can filter and sort without touching the strings
+    again. Deadlines that match no known format are kept aside in unparsed.
+    """
+
+    def __init__(self, assignments, tz=None):
+        self.tz = tz or portal_timezone
+        raw = pd.Series([a.get("Deadline") or "" for a in assignments], dtype="object")
+        raw = raw.str.split().str.join(" ")
+
+        parsed = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns]")
+        for fmt in deadline_formats:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            found = pd.to_datetime(raw[missing], format=fmt, errors="coerce")
+            if fmt in date_only_formats:
+                found = found + pd.Timedelta(hours=23, minutes=59)
+            parsed[missing] = found.astype("datetime64[ns]")
+
+        self.deadlines = parsed.dt.tz_localize(self.tz, ambiguous="NaT", nonexistent="shift_forward")
+        known = self.deadlines.notna()
+        ordered = self.deadlines[known].sort_values(kind="stable")
+        self._sorted_positions = ordered.index.to_numpy()
+        self._sorted_utc = ordered.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        self.unparsed = raw.index[~known].to_numpy()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def now(self):
+        return pd.Timestamp.now(tz=self.tz)
+
+    def _utc(self, when):
+        when = pd.Timestamp(when)
+        if when.tzinfo is None:
+            when = when.tz_localize(self.tz)
+        return when.tz_convert("UTC").tz_localize(None).to_datetime64().astype("datetime64[ns]")
+
+    def deadline(self, position):
+        """The parsed, timezone-aware deadline of one assignment, or None"""
+        value = self.deadlines.iloc[position]
+        return None if pd.isna(value) else value
+
+    def between(self, start, end):
+        """Positions due in [start, end), soonest first"""
+        lo, hi = self._sorted_utc.searchsorted([self._utc(start), self._utc(end)], side="left")
+        return self._sorted_positions[lo:hi].tolist()
+
+    def due_within(self, days, now=None):
+        """Positions still open and due in the next days days, soonest first"""
+        now = self.now() if now is None else now
+        return self.between(now, pd.Timestamp(now) + pd.Timedelta(days=days))
+
+    def overdue(self, now=None):
+        """Positions whose deadline has passed, most recently missed first"""
+        cut = self._sorted_utc.searchsorted(self._utc(self.now() if now is None else now), side="left")
+        return self._sorted_positions[:cut][::-1].tolist()
+
+    def by_deadline(self):
+        """Every position, earliest deadline first and unparseable deadlines last"""
+        return self._sorted_positions.tolist() + self.unparsed.tolist()
+
+    def by_urgency(self, now=None):
+        """Open assignments soonest first, then overdue ones, then unparseable deadlines"""
+        cut = self._sorted_utc.searchsorted(self._utc(self.now() if now is None else now), side="left")
+        return (self._sorted_positions[cut:].tolist() + self._sorted_positions[:cut][::-1].tolist()
+                + self.unparsed.tolist())
+
+def parse_assignments(page_html):
+    """Parse the first assignments table with lxml when available, else with BeautifulSoup"""
+    if lxml_html is not None:
+        try:
+            return parse_assignments_lxml(page_html)
+        except (ValueError, etree.ParserError):
+            pass  # Empty or unparseable markup; let html.parser have a go
+    return parse_assignments_soup(page_html)
+
+_table_tag = re.compile(r"<(/?)table\b[^>]*>", re.IGNORECASE)
+
+def first_table_html(page_html):
+    """
+    Markup of the first <table> in a page up to its own closing tag, nested
+    tables included (the rest of the page if it is never closed), or None
+    """
+    depth, start = 0, None
+    for tag in _table_tag.finditer(page_html):
+        if not tag.group(1):
+            if depth == 0:
+                start = tag.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                return page_html[start:tag.end()]
+    return page_html[start:] if start is not None else None
+
+def parse_assignments_lxml(page_html):
+    assignments_data = []
+
+    # Only hand the table itself to the parser when it can be sliced out cheaply
+    table_html = first_table_html(page_html)
+    tree = lxml_html.fromstring(table_html or page_html)
+    assignments_table = tree if tree.tag == "table" else tree.find(".//table")
+
+    if assignments_table is None:
+        logger.debug("No assignments table in this course page")
+        return []
+
+    # Rows and cells of this table only, not of tables nested inside its cells
+    rows = [row for row in assignments_table.iter("tr") if next(row.iterancestors("table")) is assignments_table][1:]
+
+    for row in rows:
+        cells = row.findall("td")
+        if len(cells) > 6:  # Ensure there are enough columns
+            links = cells[2].xpath(".//a[@href]")
+            record = assignment_record(
+                cells[1].text_content().strip(),
+                cells[6].text_content().strip(),
+                cells[7].text_content().strip(),
+                links[0].get("href", "") if links else None,
+            )
+            if record is not None:
+                assignments_data.append(record)
+
+    return assignments_data
+
+def parse_assignments_soup(page_html, only_table=True):
+    """Pure-Python parser; only_table=False parses the whole page like the original scraper did"""
+    assignments_data = []
+
+    parse_only = SoupStrainer("table") if only_table else None
+    soup = BeautifulSoup(page_html, 'html.parser', parse_only=parse_only)
+    assignments_table = soup.find("table")
+    
+    if not assignments_table:
+        logger.debug("No assignments table in this course page")
+        return []
+
+    # Rows and cells of this table only, not of tables nested inside its cells
+    rows = [row for row in assignments_table.find_all("tr") if row.find_parent("table") is assignments_table][1:]
+
+    for row in rows:
+        cells = row.find_all("td", recursive=False)
+        if len(cells) > 6:  # Ensure there are enough columns
+            # Extract the download link from cell[2]
+            download_link_tag = cells[2].find('a', href=True)
+            record = assignment_record(
+                cells[1].text.strip(),
+                cells[6].text.strip(),
+                cells[7].text.strip(),
+                download_link_tag.get('href', '') if download_link_tag else None,
+            )
+            if record is not None:
+                assignments_data.append(record)
+    
+    return assignments_data
+
+def table_fingerprint(page_html):
+    """Hash of the first assignments table in a course page (the span parse_assignments_lxml reads), without parsing the page"""
+    return hashlib.sha256((first_table_html(page_html) or "").encode("utf-8", "replace")).hexdigest()
+
+class AssignmentCache:
+    """
+    Per-user, per-course cache of extract_assignments output with a TTL and LRU
+    eviction. Each entry keeps the fingerprint of the course's assignments
+    table so a refresh only re-parses courses whose table changed.
+
+    Users are identified by an HMAC of their credentials under a per-process
+    secret, so cached results are only ever shown after the right password
+    is entered and no password is kept.
+    """
+
+    def __init__(self, max_entries=5000, ttl=900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._secret = secrets.token_bytes(32)
+        self._entries = OrderedDict()  # (user_key, course) -> (fingerprint, assignments, stored_at)
+        self._course_order = OrderedDict()  # user_key -> [course names] from the last full scrape, LRU
+        self._lock = threading.Lock()
+
+    def user_key(self, username, password):
+        return hmac.new(self._secret, f"{username}\0{password}".encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _copy(assignments):
+        return [dict(assignment) for assignment in assignments]
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[2] > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, user_key, course, fingerprint):
+        """Cached assignments for a course if its table fingerprint is unchanged, else None"""
+        with self._lock:
+            entry = self._live((user_key, course), time.time())
+            if entry is None or entry[0] != fingerprint:
+                return None
+            return self._copy(entry[1])
+
+    def put(self, user_key, course, fingerprint, assignments):
+        with self._lock:
+            self._entries[(user_key, course)] = (fingerprint, self._copy(assignments), time.time())
+            self._entries.move_to_end((user_key, course))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_courses(self, user_key, courses):
+        with self._lock:
+            self._course_order[user_key] = list(courses)
+            self._course_order.move_to_end(user_key)
+            # Every user with an order normally has entries too, so the same bound applies
+            while len(self._course_order) > self.max_entries:
+                self._course_order.popitem(last=False)
+
+    def get_user(self, user_key):
+        """All live cached assignments for a user in course order, with the oldest entry's time"""
+        with self._lock:
+            now = time.time()
+            assignments, stored = [], []
+            for course in self._course_order.get(user_key, []):
+                entry = self._live((user_key, course), now)
+                if entry is not None:
+                    assignments.extend(self._copy(entry[1]))
+                    stored.append(entry[2])
+            if not stored:
+                # Nothing left to show for this user, so the order is not needed either
+                self._course_order.pop(user_key, None)
+                return None, None
+            self._course_order.move_to_end(user_key)
+            return assignments, min(stored)
+
+def get_assignment_cache():
+    return _shared("assignment_cache", lambda: AssignmentCache(
+        max_entries=int(os.environ.get("BUKC_CACHE_ENTRIES", "5000")),
+        ttl=float(os.environ.get("BUKC_CACHE_TTL", "900")),
+    ))
+
+def parse_course_page(page_html, course_name, cache=None, user_key=None):
+    """Assignments for one course page, reusing the cached parse when the table is unchanged"""
+    if cache is not None and user_key is not None:
+        fingerprint = table_fingerprint(page_html)
+        cached = cache.get(user_key, course_name, fingerprint)
+        if cached is not None:
+            return cached
+
+    assignments = parse_assignments(page_html)
+    for assignment in assignments:
+        assignment["Course"] = course_name
+
+    if cache is not None and user_key is not None:
+        cache.put(user_key, course_name, fingerprint, assignments)
+    return assignments
+
+course_retries = int(os.environ.get("BUKC_COURSE_RETRIES", "3"))
+retry_backoff = float(os.environ.get("BUKC_RETRY_BACKOFF", "0.5"))
+browser_restarts = int(os.environ.get("BUKC_BROWSER_RESTARTS", "2"))
+
+class CourseCheckpoint:
+    """
+    Per-course results of one scrape. A scrape interrupted by a crashed
+    browser resumes from pending() with a new driver instead of starting
+    over, and courses given up on are kept in skipped (course -> reason)
+    so they can be reported.
+    """
+
+    def __init__(self):
+        self.courses = None          # [course_name] in dropdown order, once known
+        self.results = OrderedDict()  # course_name -> assignments
+        self.skipped = OrderedDict()  # course_name -> reason
+
+    def pending(self):
+        return [c for c in self.courses or [] if c not in self.results and c not in self.skipped]
+
+    def complete(self, course_name, assignments):
+        self.results[course_name] = assignments
+        self.skipped.pop(course_name, None)
+
+    def skip(self, course_name, reason):
+        self.skipped[course_name] = reason
+
+    def assignments(self):
+        """Every finished course's assignments, in dropdown order"""
+        order = self.courses or list(self.results)
+        return [a for course_name in order for a in self.results.get(course_name, [])]
+
+def backoff(attempt):
+    """Sleep before retry number attempt (1-based): retry_backoff, then doubling"""
+    time.sleep(retry_backoff * (2 ** (attempt - 1)))
+
+def read_course_options(wait, driver):
+    """[(value, name)] from the courseName dropdown, retrying a bounded number of times if it goes stale"""
+    for attempt in range(1, course_retries + 1):
+        try:
+            course_dropdown = wait_until(driver, "course_list", EC.presence_of_element_located((By.NAME, "courseName")))
+            return [
+                ((option.get_attribute("value") or "").strip(), option.text.strip())
+                for option in Select(course_dropdown).options
+                if option.text.strip() and option.text.strip() != "Select Course"
+            ]
+        except StaleElementReferenceException:
+            metrics.inc("stale_element_retries_total", where="course_list")
+            if attempt == course_retries:
+                raise
+            backoff(attempt)
+
+# Step 4: Extract assignments for all courses
+@metrics.timed("extract_all_courses")
+def extract_all_courses(wait, driver, cache=None, user_key=None, progress=None, checkpoint=None):
+    """
+    Scrape every course not yet finished in checkpoint (a fresh one by
+    default) and return all finished courses' assignments. A course that
+    keeps going stale or timing out is retried with backoff, then skipped
+    and reported. Other WebDriverExceptions (a crashed browser) propagate
+    with the checkpoint intact so scrape_with_browser can resume.
+    """
+    driver.get(lms_url)
+
+    progress = progress or ProgressReporter()
+    checkpoint = checkpoint or CourseCheckpoint()
+
+    course_options = read_course_options(wait, driver)
+    if checkpoint.courses is None:
+        checkpoint.courses = [course_name for _, course_name in course_options]
+    pending = set(checkpoint.pending())
+    total_courses = len(checkpoint.courses)
+
+    # Start the progress bar
+    progress.progress(int(((total_courses - len(pending)) / total_courses) * 100) if total_courses else 0)
+
+    # Fetch every course view at once with the driver's cookies when the options carry values
+    if parallel_courses and all(value for value, _ in course_options):
+        fetch_all_courses(get_http_session(driver), [o for o in course_options if o[1] in pending], progress,
+                          cache=cache, user_key=user_key, checkpoint=checkpoint)
+        if cache is not None and user_key is not None:
+            cache.set_courses(user_key, checkpoint.courses)
+        progress.progress(100)
+        progress.status("All assignments extracted successfully!")
+        progress.clear()
+        return checkpoint.assignments()
+    
+    # Iterate through the courses not finished yet
+    for course_name in checkpoint.pending():
+        progress.status(f"Fetching assignments for: {course_name}")
+        finished = len(checkpoint.results) + len(checkpoint.skipped)
+        progress.progress(int((finished / total_courses) * 100))
+
+        for attempt in range(1, course_retries + 1):
+            try:
+                with metrics.span("course", course=course_name, engine="selenium", attempt=attempt):
+                    # Refresh dropdown each time to prevent stale element issues
+                    course_dropdown = wait.until(EC.presence_of_element_located((By.NAME, "courseName")))
+                    select = Select(course_dropdown)
+                    old_page = driver.find_element(By.TAG_NAME, "html")
+                    old_tables = driver.find_elements(By.TAG_NAME, "table")
+                    select.select_by_visible_text(course_name)
+
+                    # Wait until the course's assignments view has replaced the previous one
+                    wait_until(driver, "course_view", page_replaced(old_page, old_tables[0] if old_tables else None))
+
+                    # Extract assignments
+                    assignments = parse_course_page(course_table_html(driver), course_name, cache, user_key)
+                checkpoint.complete(course_name, assignments)
+                progress.course_done(course_name, assignments)
+                break
+            except (StaleElementReferenceException, TimeoutException) as e:
+                reason = "stale element" if isinstance(e, StaleElementReferenceException) else "timed out"
+                metrics.inc("course_retries_total", reason=reason)
+                if attempt == course_retries:
+                    checkpoint.skip(course_name, f"{reason} after {attempt} attempts")
+                    metrics.inc("courses_skipped_total")
+                    progress.error(f"Skipped course {course_name}: {reason} after {attempt} attempts")
+                    break
+                progress.status(f"Retrying course {course_name} ({reason})")
+                backoff(attempt)
+                # Start the retry from a freshly loaded course list
+                driver.get(lms_url)
+    
+    if cache is not None and user_key is not None:
+        cache.set_courses(user_key, checkpoint.courses)
+
+    progress.progress(100)
+    progress.status("All assignments extracted successfully!")
+    progress.clear()
+    
+    return checkpoint.assignments()
+
+def scrape_with_browser(username, password, cache=None, user_key=None, progress=None, pool=None,
+                        checkpoint=None, max_restarts=None, vault=None):
+    """
+    Selenium pipeline on a pooled browser. If the browser crashes mid-scrape
+    (a WebDriver error after which it no longer responds) it is discarded, a
+    replacement is checked out and logged in again, and extraction resumes
+    from the first unfinished course, up to max_restarts times. Errors on a
+    browser that still responds are raised without a restart. Returns
+    (driver, checkpoint) with the driver still leased, or (None, None) when
+    the credentials were rejected. With a vault, stored cookies are tried
+    before the login form, including after a restart.
+    """
+    pool = pool or get_driver_pool()
+    progress = progress or ProgressReporter()
+    checkpoint = checkpoint or CourseCheckpoint()
+    max_restarts = browser_restarts if max_restarts is None else max_restarts
+
+    restarts = 0
+    driver = pool.checkout()
+    while True:
+        try:
+            wait = WebDriverWait(driver, 10)
+            if not authenticate_browser(wait, driver, username, password, vault):
+                pool.checkin(driver)
+                return None, None
+            extract_all_courses(wait, driver, cache, user_key, progress, checkpoint)
+            return driver, checkpoint
+        except WebDriverException as e:
+            if pool.is_healthy(driver):
+                # A timeout or a missing element on a live browser means the portal was slow or its markup
+                # changed; a fresh browser and another login would not help
+                pool.checkin(driver)
+                raise
+            pool.discard(driver)
+            if restarts >= max_restarts:
+                raise
+            restarts += 1
+            metrics.inc("browser_restarts_total")
+            progress.status(f"Browser failed ({type(e).__name__}); restarting and resuming after "
+                            f"{len(checkpoint.results)} finished courses")
+            backoff(restarts)
+            driver = pool.checkout()
+        except Exception:
+            pool.checkin(driver)
+            raise
+
+def parse_course_options(page_html):
+    """Return [(value, name)] for the courseName dropdown on Assignments.php"""
+    soup = BeautifulSoup(page_html, 'html.parser')
+    course_dropdown = soup.find("select", attrs={"name": "courseName"})
+    if course_dropdown is None:
+        return []
+    return [
+        (option.get("value", "").strip(), option.text.strip())
+        for option in course_dropdown.find_all("option")
+        if option.text.strip() and option.text.strip() != "Select Course" and option.get("value", "").strip()
+    ]
+
+def course_url(value):
+    """Assignments.php view for one course option value"""
+    if ".php" in value or "?" in value:
+        return urllib.parse.urljoin(lms_url, value)
+    return f"{lms_url}?{urllib.parse.urlencode({'oc': value})}"
+
+def fetch_course_assignments(session, value, course_name, cache=None, user_key=None):
+    """Fetch and parse one course's Assignments.php view"""
+    with metrics.span("course", course=course_name, engine="http"):
+        response = session.get(course_url(value), timeout=10)
+        response.raise_for_status()
+        require_course_dropdown(response.text, response.url)
+        return parse_course_page(response.text, course_name, cache, user_key)
+
+def fetch_all_courses(session, options, progress=None, max_workers=None, cache=None, user_key=None,
+                      checkpoint=None):
+    """
+    Fetch every course in options ([(value, name)]) on a bounded thread pool.
+    Progress is reported from the calling thread as courses finish, and the
+    results are merged back in dropdown order. Courses that fail are reported
+    and, with a checkpoint, recorded as skipped.
+    """
+    progress = progress or ProgressReporter()
+    total_courses = len(options)
+    if total_courses == 0:
+        return []
+
+    results = [[] for _ in options]
+    workers = max(1, min(max_workers or course_workers, total_courses))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(fetch_course_assignments, session, value, course_name, cache, user_key): i
+            for i, (value, course_name) in enumerate(options)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            course_name = options[i][1]
+            try:
+                results[i] = future.result()
+                if checkpoint is not None:
+                    checkpoint.complete(course_name, results[i])
+                progress.status(f"Fetching assignments for: {course_name}")
+                progress.course_done(course_name, results[i])
+            except (LoginPageError, requests.RequestException) as e:
+                # One course page without the dropdown (an error page, a layout change) is skipped like a failed request
+                if checkpoint is not None:
+                    checkpoint.skip(course_name, str(e))
+                metrics.inc("courses_skipped_total")
+                progress.error(f"Skipped course {course_name}: {e}")
+            progress.progress(int((done / total_courses) * 100))
+    return [assignment for course_assignments in results for assignment in course_assignments]
+
+# Step 4 (browserless): fetch each course's Assignments.php view over HTTP
+@metrics.timed("extract_all_courses")
+def extract_all_courses_http(session, cache=None, user_key=None, progress=None, checkpoint=None):
+    response = session.get(lms_url, timeout=10)
+    response.raise_for_status()
+    # A login page or any other page without the dropdown is not an account with no courses
+    require_course_dropdown(response.text, response.url)
+
+    progress = progress or ProgressReporter()
+    options = parse_course_options(response.text)
+    if checkpoint is not None and checkpoint.courses is None:
+        checkpoint.courses = [course_name for _, course_name in options]
+
+    # Start the progress bar
+    progress.progress(0)
+    all_assignments = fetch_all_courses(session, options, progress, cache=cache, user_key=user_key,
+                                        checkpoint=checkpoint)
+    if cache is not None and user_key is not None:
+        cache.set_courses(user_key, [course_name for _, course_name in options])
+
+    progress.progress(100)
+    progress.status("All assignments extracted successfully!")
+    progress.clear()
+
+    return all_assignments
+
+def login_and_extract_http(username, password, cache=None, user_key=None, progress=None, checkpoint=None,
+                           vault=None):
+    """
+    Browserless pipeline. Returns (session, assignments), or (None, None) when the
+    credentials were rejected. Raises LoginPageError / requests errors when the
+    portal could not be driven over HTTP so the caller can fall back to Selenium.
+    Courses that could not be fetched are recorded in checkpoint, if given.
+    With a vault, still-valid cookies from an earlier login skip the login form.
+    """
+    session = reuse_http_session(vault, username, password)
+    if session is not None:
+        try:
+            return session, extract_all_courses_http(session, cache, user_key, progress, checkpoint)
+        except Exception:
+            session.close()
+            raise
+
+    session = create_http_session()
+    try:
+        if not http_login_to_cms(session, username, password):
+            session.close()
+            return None, None
+        if not http_navigate_to_lms(session):
+            raise LoginPageError("GoToLMS.aspx did not reach the LMS")
+        if vault is not None:
+            vault.put(username, password, session_cookies(session))
+        return session, extract_all_courses_http(session, cache, user_key, progress, checkpoint)
+    except Exception:
+        session.close()
+        raise
@@ -0,0 +1,51 @@
+"""
+Shared fixtures: one mock_cms server for the whole run. scraper reads the
+portal URLs at import time, so the server is started and the environment
+set before any test module imports it.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_cms import MockState, start_mock_server  # noqa: E402
+
+USERNAME = "02-134212-001"
+PASSWORD = "secret"
+
+SERVER, BASE_URL = start_mock_server()
+os.environ["BUKC_CMS_BASE"] = BASE_URL
+os.environ["BUKC_LMS_BASE"] = BASE_URL
+os.environ["BUKC_DOWNLOAD_CACHE_DIR"] = tempfile.mkdtemp(prefix="bukc-test-downloads-")
+os.environ["BUKC_RETRY_BACKOFF"] = "0"
+
+import scraper  # noqa: E402
+
+DEFAULTS = {name: value for name, value in vars(MockState()).items()
+            if name in ("file_size", "landing_pages", "interrupt_after", "browser_only")}
+
+
+@pytest.fixture
+def mock():
+    """The mock's state; options a test changes are put back afterwards"""
+    yield SERVER.state
+    for name, value in DEFAULTS.items():
+        setattr(SERVER.state, name, value)
+
+
+@pytest.fixture
+def session(mock):
+    """An HTTP session logged in to the mock LMS"""
+    session, _ = scraper.login_and_extract_http(USERNAME, PASSWORD)
+    yield session
+    session.close()
+
+
+def counter(name):
+    """Current value of a pipeline_metrics counter (0 when never incremented)"""
+    return scraper.metrics.snapshot()[1].get(name, 0)
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import scraper
+
+TZ = "Asia/Karachi"
+
+
+def at(text, tz=TZ):
+    return pd.Timestamp(text, tz=tz)
+
+
+# One example per entry in scraper.deadline_formats, all meaning 3 September 2026, 23:59
+EXAMPLES = {
+    "%d %B %Y - %I:%M %p": "3 September 2026 - 11:59 pm",
+    "%d %B %Y - %H:%M": "3 September 2026 - 23:59",
+    "%d %b %Y - %I:%M %p": "3 Sep 2026 - 11:59 PM",
+    "%d-%m-%Y %H:%M": "03-09-2026 23:59",
+    "%Y-%m-%d %H:%M:%S": "2026-09-03 23:59:00",
+    "%d %B %Y": "3 September 2026",  # Date only: the end of that day
+}
+
+
+def test_every_deadline_format_has_an_example():
+    assert set(EXAMPLES) == set(scraper.deadline_formats)
+
+
+@pytest.mark.parametrize("text", list(EXAMPLES.values()) + [" 3  September 2026 -\n 11:59 pm "])
+def test_every_deadline_format_is_parsed(text):
+    index = scraper.DeadlineIndex([{"Deadline": text}], tz=TZ)
+    assert index.deadline(0) == at("2026-09-03 23:59")
+    assert index.unparsed.tolist() == []
+
+
+def test_deadlines_are_localised_to_the_portal_timezone():
+    karachi = scraper.DeadlineIndex([{"Deadline": "3 September 2026 - 11:59 pm"}], tz=TZ)
+    london = scraper.DeadlineIndex([{"Deadline": "3 September 2026 - 11:59 pm"}], tz="Europe/London")
+    assert str(karachi.deadline(0).tz) == TZ
+    assert karachi.deadline(0) == at("2026-09-03 18:59", tz="UTC")
+    assert london.deadline(0) == at("2026-09-03 22:59", tz="UTC")
+
+
+@pytest.fixture
+def index():
+    return scraper.DeadlineIndex([
+        {"Deadline": "10 September 2026 - 12:00 pm"},  # 0
+        {"Deadline": "not a date"},                     # 1
+        {"Deadline": "5 September 2026 - 09:00 am"},   # 2
+        {"Deadline": "8 September 2026"},               # 3: 23:59 that day
+        {"Deadline": "1 September 2026 - 09:00 am"},   # 4
+        {"Deadline": None},                             # 5
+    ], tz=TZ)
+
+
+def test_unparseable_deadlines_are_kept_aside(index):
+    assert len(index) == 6
+    assert index.unparsed.tolist() == [1, 5]
+    assert index.deadline(1) is None
+    assert index.by_deadline() == [4, 2, 3, 0, 1, 5]
+
+
+def test_due_within_includes_now_and_excludes_the_end(index):
+    now = at("2026-09-07 12:00")
+    # Assignment 0 is due exactly three days from now
+    assert index.due_within(3, now=now) == [3]
+    assert index.due_within(4, now=now) == [3, 0]
+    assert index.due_within(1, now=at("2026-09-08 23:59")) == [3]
+
+
+def test_overdue_is_strictly_before_now(index):
+    assert index.overdue(now=at("2026-09-08 23:59")) == [2, 4]
+    assert index.overdue(now=at("2026-09-09 00:00")) == [3, 2, 4]
+
+
+def test_naive_and_other_timezone_now_are_compared_in_portal_time(index):
+    assert index.overdue(now=pd.Timestamp("2026-09-08 23:59")) == [2, 4]
+    assert index.overdue(now=at("2026-09-08 18:59", tz="UTC")) == [2, 4]
+    assert index.overdue(now=at("2026-09-08 19:00", tz="UTC")) == [3, 2, 4]
+
+
+def test_by_urgency_orders_open_then_overdue_then_unparsed(index):
+    assert index.by_urgency(now=at("2026-09-07 12:00")) == [3, 0, 2, 4, 1, 5]
+    assert index.by_urgency(now=at("2026-09-01 09:00")) == [4, 2, 3, 0, 1, 5]
@@ -0,0 +1,33 @@
+import hashlib
+import urllib.parse
+
+from conftest import counter
+
+import scraper
+
+
+def test_interrupted_download_resumes_with_range(mock, session, tmp_path):
+    mock.file_size = 3 * 1024 * 1024
+    mock.interrupt_after = 500 * 1024
+    url = urllib.parse.urljoin(scraper.lms_url, "Download.php?id=0-1")
+    before = counter("download_resumes_total")
+
+    file_obj, filename = scraper.open_download(session, url, scraper.DownloadCache(str(tmp_path)))
+    with file_obj:
+        content = file_obj.read()
+
+    assert filename == "handout_0-1.pdf"
+    assert counter("download_resumes_total") - before == 1
+    assert hashlib.sha256(content).hexdigest() == hashlib.sha256(mock.file_bytes("0-1")).hexdigest()
+
+
+def test_oversized_landing_page_is_kept_as_a_file(mock, session, tmp_path, monkeypatch):
+    mock.landing_pages = True
+    url = urllib.parse.urljoin(scraper.lms_url, "Handout.php?id=0-1")
+    page = session.get(url, timeout=10).content
+    assert len(page) > 100 and b"Download.php?id=0-1" in page
+    monkeypatch.setattr(scraper, "max_landing_page_bytes", 100)
+
+    file_obj, _ = scraper.open_download(session, url, scraper.DownloadCache(str(tmp_path)))
+    with file_obj:
+        assert file_obj.read() == page
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+import scraper
+
+
+class FakeDriver:
+    """Just enough of a Chrome WebDriver for WebDriverPool: a health check, the reset calls and quit"""
+
+    def __init__(self):
+        self.crashed = False
+        self.quit_called = False
+        self.cdp_commands = []
+
+    def execute_script(self, script):
+        if self.crashed:
+            raise scraper.WebDriverException("chrome not reachable")
+        return 1
+
+    @property
+    def window_handles(self):
+        return [] if self.crashed else ["main"]
+
+    def execute_cdp_cmd(self, command, params):
+        if self.crashed:
+            raise scraper.WebDriverException("chrome not reachable")
+        self.cdp_commands.append(command)
+
+    def get(self, url):
+        pass
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**options):
+        launched = []
+
+        def factory():
+            launched.append(FakeDriver())
+            return launched[-1]
+
+        # Maintenance briefly leases idle drivers for its health check, so it only runs often when asked to
+        options = {"min_idle": 0, "check_interval": 60, **options}
+        pools.append(scraper.WebDriverPool(factory=factory, **options))
+        return pools[-1], launched
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_checked_in_driver_is_wiped_and_reused(make_pool):
+    pool, launched = make_pool(max_size=2)
+    driver = pool.checkout()
+    assert launched == [driver]
+    assert pool.stats() == {"idle": 0, "leased": 1, "launching": 0, "max_size": 2}
+
+    pool.checkin(driver)
+    assert "Network.clearBrowserCookies" in driver.cdp_commands
+    assert pool.stats()["idle"] == 1
+    assert pool.checkout() is driver
+    assert len(launched) == 1
+
+
+def test_checkout_waits_for_a_free_driver_at_max_size(make_pool):
+    pool, _ = make_pool(max_size=1)
+    driver = pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout(timeout=0.05)
+
+    threading.Timer(0.05, pool.checkin, args=[driver]).start()
+    assert pool.checkout(timeout=5) is driver
+
+
+def test_driver_that_cannot_be_wiped_is_quit(make_pool):
+    pool, _ = make_pool()
+    driver = pool.checkout()
+    driver.crashed = True
+
+    pool.checkin(driver)
+    assert driver.quit_called
+    assert pool.stats()["idle"] == 0
+
+
+def test_discarded_driver_frees_its_slot(make_pool):
+    pool, launched = make_pool(max_size=1)
+    driver = pool.checkout()
+    assert pool.is_healthy(driver)
+    driver.crashed = True
+    assert not pool.is_healthy(driver)
+
+    pool.discard(driver)
+    assert driver.quit_called
+    replacement = pool.checkout(timeout=0.5)
+    assert replacement is not driver and launched == [driver, replacement]
+
+
+def test_checkout_skips_a_crashed_idle_driver(make_pool):
+    pool, _ = make_pool()
+    driver = pool.checkout()
+    pool.checkin(driver)
+    driver.crashed = True
+
+    replacement = pool.checkout()
+    assert replacement is not driver
+    assert driver.quit_called
+
+
+def test_idle_driver_is_evicted_after_idle_timeout(make_pool):
+    pool, _ = make_pool(idle_timeout=0.05, check_interval=0.02)
+    driver = pool.checkout()
+    pool.checkin(driver)
+
+    wait_until(lambda: driver.quit_called)
+    assert pool.stats()["idle"] == 0
+
+
+def test_warm_minimum_is_kept_and_crashed_browsers_recycled(make_pool):
+    pool, launched = make_pool(min_idle=1, idle_timeout=0.05, check_interval=0.02)
+    wait_until(lambda: pool.stats()["idle"] == 1)
+    warm = launched[0]
+    time.sleep(0.1)
+    # Past idle_timeout, but it is the warm minimum
+    assert not warm.quit_called and len(launched) == 1
+
+    warm.crashed = True
+    wait_until(lambda: warm.quit_called and pool.stats()["idle"] == 1)
+    assert len(launched) == 2 and not launched[1].quit_called
+
+
+def test_abandoned_lease_is_reclaimed(make_pool):
+    pool, _ = make_pool(max_size=1, lease_timeout=0.05, check_interval=0.02)
+    driver = pool.checkout()
+
+    wait_until(lambda: driver.quit_called)
+    assert pool.stats()["leased"] == 0
+    # The session that held it logs out late; nothing is returned to the pool
+    pool.checkin(driver)
+    assert pool.stats()["idle"] == 0
+    assert pool.checkout(timeout=0.5) is not driver
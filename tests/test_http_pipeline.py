@@ -0,0 +1,97 @@
+import urllib.parse
+
+import pytest
+from conftest import PASSWORD, USERNAME, counter
+
+import scraper
+
+
+def outstanding(state):
+    """(course, assignment) pairs the scrape should return: everything not past its deadline"""
+    return sorted((course["name"], assignment["name"])
+                  for course in state.accounts[USERNAME]["courses"]
+                  for assignment in course["assignments"] if assignment["status"] != "Deadline Exceeded")
+
+
+def test_login_and_extract(mock):
+    session, assignments = scraper.login_and_extract_http(USERNAME, PASSWORD)
+    session.close()
+    assert sorted((a["Course"], a["Assignment"]) for a in assignments) == outstanding(mock)
+    assert all(a["Download Link"] for a in assignments)
+
+
+def test_wrong_password_is_rejected(mock):
+    assert scraper.login_and_extract_http(USERNAME, "wrong") == (None, None)
+
+
+def test_session_without_lms_login_raises(mock):
+    session = scraper.create_http_session()
+    with pytest.raises(scraper.LoginPageError):
+        scraper.extract_all_courses_http(session)
+    assert not scraper.http_navigate_to_lms(session)
+
+
+def test_vault_session_is_reused(mock):
+    vault = scraper.SessionVault()
+    session, _ = scraper.login_and_extract_http(USERNAME, PASSWORD, vault=vault)
+    session.close()
+    logins = len(mock.cms_sessions)
+    reused = counter('session_vault_total{result="reused"}')
+
+    session, assignments = scraper.login_and_extract_http(USERNAME, PASSWORD, vault=vault)
+    session.close()
+    assert len(mock.cms_sessions) == logins
+    assert counter('session_vault_total{result="reused"}') - reused == 1
+    assert sorted((a["Course"], a["Assignment"]) for a in assignments) == outstanding(mock)
+
+
+def test_vault_session_rejected_by_portal_logs_in_again(mock):
+    vault = scraper.SessionVault()
+    session, _ = scraper.login_and_extract_http(USERNAME, PASSWORD, vault=vault)
+    session.close()
+    stale_id = vault.entry_id(USERNAME, PASSWORD)
+    stale = vault.get(USERNAME, PASSWORD)
+    # The portal forgets every LMS session, as after a server-side logout
+    with mock.lock:
+        mock.lms_sessions.clear()
+    rejected = counter('session_vault_total{result="rejected"}')
+
+    session, assignments = scraper.login_and_extract_http(USERNAME, PASSWORD, vault=vault)
+    session.close()
+    assert counter('session_vault_total{result="rejected"}') - rejected == 1
+    assert sorted((a["Course"], a["Assignment"]) for a in assignments) == outstanding(mock)
+    assert vault.get(USERNAME, PASSWORD) != stale
+    assert vault.entry_id(USERNAME, PASSWORD) == stale_id
+
+
+def test_landing_page_resolves_to_file(mock, tmp_path):
+    mock.landing_pages = True
+    session, assignments = scraper.login_and_extract_http(USERNAME, PASSWORD)
+    link = assignments[0]["Download Link"]
+    file_id = urllib.parse.parse_qs(urllib.parse.urlparse(link).query)["id"][0]
+    assert "Handout.php" in link
+
+    file_obj, filename = scraper.open_download(session, link, scraper.DownloadCache(str(tmp_path)))
+    session.close()
+    with file_obj:
+        assert file_obj.read() == mock.file_bytes(file_id)
+    assert filename == f"handout_{file_id}.pdf"
+
+
+def test_course_page_without_dropdown_is_skipped(mock, session, monkeypatch):
+    options = scraper.parse_course_options(session.get(scraper.lms_url, timeout=10).text)
+    broken_value, broken_name = options[0]
+    require_course_dropdown = scraper.require_course_dropdown
+
+    def fake_require(page_html, url):
+        if url == scraper.course_url(broken_value):
+            raise scraper.LoginPageError(f"No course dropdown on {url}")
+        require_course_dropdown(page_html, url)
+
+    monkeypatch.setattr(scraper, "require_course_dropdown", fake_require)
+    checkpoint = scraper.CourseCheckpoint()
+    checkpoint.courses = [name for _, name in options]
+    assignments = scraper.fetch_all_courses(session, options, checkpoint=checkpoint)
+
+    assert list(checkpoint.skipped) == [broken_name]
+    assert {a["Course"] for a in assignments} == {name for name, _ in outstanding(mock)} - {broken_name}
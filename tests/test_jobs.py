@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+import scraper
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+def blocking_job(name, gate, started):
+    """A ScrapeJob that records its start, then reports progress until gate is set and returns name"""
+    def target(progress):
+        started.append(name)
+        while not gate.wait(0.01):
+            progress.status("working")
+        return name
+    return scraper.ScrapeJob(target, name=name)
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(**options):
+        options = {"check_interval": 0.02, **options}
+        schedulers.append(scraper.JobScheduler(**options))
+        return schedulers[-1]
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_jobs_start_in_submission_order_within_the_limit(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=2)
+    started = []
+    gates = [threading.Event() for _ in range(4)]
+    jobs = [scheduler.submit(blocking_job(f"job{i}", gate, started)) for i, gate in enumerate(gates)]
+
+    wait_until(lambda: len(started) == 2)
+    assert started == ["job0", "job1"]
+    assert scheduler.stats() == {"queued": 2, "running": 2, "max_concurrent": 2}
+
+    for i, gate in enumerate(gates):
+        gate.set()
+        assert jobs[i].wait(5)
+    assert started == ["job0", "job1", "job2", "job3"]
+    assert [job.result for job in jobs] == ["job0", "job1", "job2", "job3"]
+    # The slot is freed just after the job reports done
+    wait_until(lambda: scheduler.stats()["running"] == 0)
+
+
+def test_queue_position_and_eta(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=1)
+    started = []
+    gates = [threading.Event() for _ in range(3)]
+    jobs = [scheduler.submit(blocking_job(f"job{i}", gate, started)) for i, gate in enumerate(gates)]
+    wait_until(lambda: started == ["job0"])
+
+    # No finished job yet, so every job ahead counts as 10 s
+    assert scheduler.queue_position(jobs[0]) == (0, 0.0)
+    assert scheduler.queue_position(jobs[1]) == (1, 10.0)
+    assert scheduler.queue_position(jobs[2]) == (2, 20.0)
+    assert jobs[2].snapshot()["position"] == 2
+
+    gates[0].set()
+    wait_until(lambda: started == ["job0", "job1"])
+    position, eta = scheduler.queue_position(jobs[2])
+    assert position == 1 and eta < 10.0
+    for gate in gates:
+        gate.set()
+
+
+def test_cancel_stops_a_running_job_and_frees_its_slot(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=1)
+    started = []
+    gate, next_gate = threading.Event(), threading.Event()
+    job = scheduler.submit(blocking_job("job0", gate, started))
+    waiting = scheduler.submit(blocking_job("job1", next_gate, started))
+    wait_until(lambda: started == ["job0"])
+
+    scheduler.cancel(job, "Stopped by the user")
+    assert job.wait(5)
+    assert isinstance(job.exception, scraper.JobCancelledError)
+    assert str(job.exception) == "Stopped by the user"
+    wait_until(lambda: started == ["job0", "job1"])
+    next_gate.set()
+    assert waiting.wait(5) and waiting.result == "job1"
+
+
+def test_cancelled_queued_job_never_starts(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=1)
+    started = []
+    gate = threading.Event()
+    scheduler.submit(blocking_job("job0", gate, started))
+    queued = scheduler.submit(blocking_job("job1", gate, started))
+
+    scheduler.cancel(queued)
+    assert queued.done() and isinstance(queued.exception, scraper.JobCancelledError)
+    gate.set()
+    time.sleep(0.1)
+    assert started == ["job0"]
+
+
+def test_result_of_a_job_cancelled_as_it_returns_is_cleaned_up():
+    cleaned = []
+    returning = threading.Event()
+
+    def target(progress):
+        returning.wait(5)
+        return "session"
+
+    job = scraper.ScrapeJob(target, cleanup=cleaned.append).start()
+    job.cancel()
+    returning.set()
+    assert job.wait(5)
+    assert cleaned == ["session"]
+    assert job.result is None and isinstance(job.exception, scraper.JobCancelledError)
+
+
+def test_job_nobody_polls_is_abandoned(make_scheduler):
+    scheduler = make_scheduler(abandon_timeout=0.1)
+    gate = threading.Event()
+    job = scheduler.submit(blocking_job("job0", gate, []))
+
+    assert job.wait(5)
+    assert str(job.exception) == "Abandoned"
+
+
+def test_job_touched_by_its_ui_is_not_abandoned(make_scheduler):
+    scheduler = make_scheduler(abandon_timeout=0.1)
+    gate = threading.Event()
+    job = scheduler.submit(blocking_job("job0", gate, []))
+
+    for _ in range(20):
+        job.touch()
+        time.sleep(0.02)
+    gate.set()
+    assert job.wait(5) and job.result == "job0"
+
+
+def test_queue_and_run_timeouts(make_scheduler):
+    scheduler = make_scheduler(max_concurrent=1, queue_timeout=0.1, run_timeout=0.3)
+    gate = threading.Event()
+    running = scheduler.submit(blocking_job("job0", gate, []))
+    queued = scheduler.submit(blocking_job("job1", gate, []))
+
+    assert queued.wait(5)
+    assert str(queued.exception) == "Timed out waiting for a free slot"
+    assert running.wait(5)
+    assert str(running.exception) == "Timed out"